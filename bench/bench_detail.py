@@ -0,0 +1,84 @@
+"""
+Текст детальной страницы (utils.detail): потоковый разбор до content_selector против
+разбора всего документа, плюс проверка приоритета селекторов.
+
+    python -m bench.bench_detail [--pages 50] [--repeat 3]
+
+Страницы синтетические (bench.fixtures.detail_page, текст в <article>), отдаются кусками
+по CHUNK байт, как ответ requests. Код выхода 1, если какая-то проверка не прошла.
+"""
+import argparse
+import sys
+import time
+
+from bench.fixtures import detail_page
+from utils.detail import CHUNK, extract_stream, extract_text, parse_selectors
+
+# (html, content_selector, должно быть в тексте, не должно быть в тексте)
+CASES = [
+    # внешний <main> открывается раньше .article-body, но приоритет у .article-body
+    (
+        "<html><body><main><h2>Latest News</h2><p>Related: Binance delists BAR</p>"
+        '<div class="article-body">Binance will list FOO token</div><p>More news</p></main></body></html>',
+        [".article-body", ".article-content", "article", "main"],
+        "will list FOO",
+        "delists BAR",
+    ),
+    # первого селектора нет — берётся лучший из сработавших, а не первый по документу
+    (
+        "<html><body><main><p>Sidebar</p><article>Gate will list BAZ</article></main></body></html>",
+        [".article-body", "article", "main"],
+        "will list BAZ",
+        "Sidebar",
+    ),
+    # ничего не сработало — весь документ без nav/footer
+    (
+        "<html><body><nav>Menu</nav><div>OKX will list QUX</div><footer>Legal</footer></body></html>",
+        [".article-body"],
+        "will list QUX",
+        "Menu",
+    ),
+]
+
+
+def _chunks(data: bytes):
+    return (data[i:i + CHUNK] for i in range(0, len(data), CHUNK))
+
+
+def check_cases() -> int:
+    bad = 0
+    for html, sel, want, unwanted in CASES:
+        text = extract_text(html, {"content_selector": sel})
+        if want not in text or unwanted in text:
+            bad += 1
+            print(f"  !! {sel}: {text!r}")
+    return bad
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    bad = check_cases()
+    print(f"selector cases: {len(CASES) - bad}/{len(CASES)} ok")
+
+    pages = [detail_page(f"Will List T{i}", seed=i).encode() for i in range(args.pages)]
+    # ни один селектор не срабатывает — разбор всего документа
+    modes = (("stream", parse_selectors(["article"])), ("full", parse_selectors([".no-such-class"])))
+    print(f"{'mode':<8} {'KB/page':>8} {'ms/page':>8}")
+    for name, sels in modes:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            for data in pages:
+                extract_stream(_chunks(data), sels, encoding="utf-8")
+            best = min(best, time.perf_counter() - t)
+        kb = sum(len(p) for p in pages) / len(pages) / 1024
+        print(f"{name:<8} {kb:>8.0f} {best * 1000 / len(pages):>8.2f}")
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Время импорта точек входа (python -X importtime в отдельном процессе, кэш .pyc прогрет).
+
+    python -m bench.bench_import [--repeat 3] [--top 8] [--max-ms 400]
+
+Для каждой цели печатает суммарное время импорта (без старта интерпретатора)
+и самые тяжёлые прямые зависимости, мс.
+Код выхода 1, если `import bot` / `import daemon` подтянули ccxt, lxml или yaml
+(они должны импортироваться только когда нужен соответствующий скан) или если
+`import bot` дольше --max-ms.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = [
+    "bot",
+    "daemon",
+    "ccxt_watcher",
+    "utils.links",
+    "ccxt",
+    "ccxt.async_support",
+]
+# не должны попадать в импорт точек входа
+LAZY = ("ccxt", "lxml", "yaml")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def importtime(module: str) -> List[Tuple[str, int, int, int]]:
+    """[(модуль, self_us, cumulative_us, depth)] для import module в чистом процессе."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else f"import {module} failed")
+    rows = []
+    for line in out.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            # отступ: 1 пробел после "|" + 2 на уровень вложенности
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2))
+    return rows
+
+
+def measure(module: str, repeat: int, startup: Set[str]) -> Dict[str, object]:
+    # startup — модули самого интерпретатора (site, encodings ...), в замер не входят
+    best = None
+    for _ in range(max(1, repeat)):
+        rows = [r for r in importtime(module) if r[0] not in startup]
+        total = sum(r[1] for r in rows)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total, rows = best
+    # самые тяжёлые прямые зависимости цели
+    top: Dict[str, int] = {}
+    for name, _self, cum, depth in rows:
+        if depth == 1:
+            top[name.split(".")[0]] = top.get(name.split(".")[0], 0) + cum
+    return {
+        "total_ms": total / 1000.0,
+        "modules": {r[0] for r in rows},
+        "top": sorted(top.items(), key=lambda kv: -kv[1]),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--top", type=int, default=8)
+    ap.add_argument("--max-ms", type=float, default=400.0, help="порог для import bot")
+    args = ap.parse_args(argv)
+
+    # первый прогон — компиляция .pyc, в замер не идёт
+    for t in TARGETS:
+        subprocess.run([sys.executable, "-c", f"import {t}"], cwd=ROOT, capture_output=True)
+
+    startup = {r[0] for r in importtime("sys")}
+
+    failed = False
+    results = {}
+    for t in TARGETS:
+        try:
+            results[t] = measure(t, args.repeat, startup)
+        except RuntimeError as e:
+            print(f"{t:<20} error: {e}")
+            continue
+        r = results[t]
+        heavy = ", ".join(f"{name} {us / 1000:.0f}" for name, us in r["top"][:args.top])
+        print(f"{t:<20} {r['total_ms']:>8.1f} ms   {heavy}")
+
+    for t in ("bot", "daemon"):
+        r = results.get(t)
+        if r is None:
+            continue
+        leaked = sorted({m.split(".")[0] for m in r["modules"]} & set(LAZY))
+        if leaked:
+            print(f"FAIL: import {t} pulls in {', '.join(leaked)}")
+            failed = True
+    if "bot" in results and results["bot"]["total_ms"] > args.max_ms:
+        print(f"FAIL: import bot {results['bot']['total_ms']:.0f} ms > {args.max_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
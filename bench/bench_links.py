@@ -0,0 +1,99 @@
+"""
+Бенчмарк извлечения ссылок: utils.links.extract_links (lxml + XPath) против
+прежнего пути на BeautifulSoup (extract_links_soup).
+
+    python -m bench.bench_links [--fixtures DIR] [--repeat N]
+
+Проверяет, что оба пути дают одинаковый результат (на крайних случаях разметки и на
+страницах), и печатает время на страницу. Страницы — сохранённые реальные из bench/pages
+(python -m bench.fetch_pages) или --fixtures DIR; для источника без сохранённой страницы
+берётся синтетическая (bench/fixtures.py), столбец page это показывает.
+"""
+import argparse
+import sys
+import time
+
+import yaml
+
+from bench.fixtures import load_page
+from utils.links import extract_links, extract_links_soup
+
+
+# крайние случаи разметки: оба пути должны давать одинаковый результат
+EDGE_CFG = {"name": "edge", "url": "https://example.com/", "link_contains": "/d/", "keywords_any": ["will list"]}
+EDGE_CASES = [
+    '<a href="/d/1">Foo <b>Will List</b> BAR</a>',
+    '<a href="/d/2"><script>will list</script>Bar</a>',
+    '<a href="/d/3"><style>.will list{}</style>Bar</a>',
+    '<a href="/d/4"><noscript>will list</noscript>Bar</a>',
+    '<a href="/d/5"><span>will</span><span>list</span> Baz</a>',
+    '<a href="/d/6">will list A</a><a href="/d/6">will list A again</a>',
+    '<a href="/x/7">will list C</a><a href="/d/8">   </a>',
+]
+
+
+def check_edge_cases() -> int:
+    bad = 0
+    for html in EDGE_CASES:
+        old = extract_links_soup(html, EDGE_CFG)
+        new = extract_links(html, EDGE_CFG)
+        if old != new:
+            bad += 1
+            print(f"  !! edge case differs: {html}\n     soup={old}\n     lxml={new}")
+    return bad
+
+
+def _time(fn, html, cfg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(html, cfg)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixtures", default=None, help="каталог с сохранёнными <exchange>.html (по умолчанию bench/pages)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--config", default="config/exchanges.yaml")
+    args = ap.parse_args(argv)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        exchanges = [e for e in (yaml.safe_load(f) or {}).get("exchanges", []) if e.get("type") == "html"]
+
+    mismatches = check_edge_cases()
+    print(f"edge cases: {len(EDGE_CASES) - mismatches}/{len(EDGE_CASES)} equal")
+
+    print(f"{'exchange':<10} {'page':<9} {'KB':>6} {'links':>5} {'soup ms':>9} {'lxml ms':>9} {'speedup':>8}")
+    total_old = total_new = 0.0
+    n_saved = 0
+
+    for cfg in exchanges:
+        html, saved = load_page(cfg, args.fixtures)
+        n_saved += saved
+        old = extract_links_soup(html, cfg)
+        new = extract_links(html, cfg)
+        if old != new:
+            mismatches += 1
+            print(f"  !! {cfg['name']}: results differ ({len(old)} vs {len(new)})")
+
+        t_old = _time(extract_links_soup, html, cfg, args.repeat)
+        t_new = _time(extract_links, html, cfg, args.repeat)
+        total_old += t_old
+        total_new += t_new
+        print(
+            f"{cfg['name']:<10} {'saved' if saved else 'synthetic':<9} {len(html) / 1024:>6.0f} {len(new):>5} "
+            f"{t_old * 1000:>9.2f} {t_new * 1000:>9.2f} {t_old / max(t_new, 1e-9):>7.1f}x"
+        )
+
+    print(f"{'total':<10} {'':<9} {'':>6} {'':>5} {total_old * 1000:>9.2f} {total_new * 1000:>9.2f} "
+          f"{total_old / max(total_new, 1e-9):>7.1f}x")
+    if n_saved < len(exchanges):
+        print(f"saved pages: {n_saved}/{len(exchanges)} — остальные синтетические, "
+              f"сохранить: python -m bench.fetch_pages")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
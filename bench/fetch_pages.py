@@ -0,0 +1,51 @@
+"""
+Сохранить реальные страницы листингов html-источников для bench.bench_links.
+
+    python -m bench.fetch_pages [--config config/exchanges.yaml] [--out bench/pages] [--force]
+
+Страница качается так же, как в bot.py (те же заголовки), и пишется в
+<out>/<имя биржи в нижнем регистре>.html. Уже сохранённые не перекачиваются без --force.
+Код выхода 1, если какую-то страницу скачать не удалось.
+"""
+import argparse
+import os
+import sys
+
+import yaml
+
+from bench.fixtures import PAGES_DIR, page_path
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", default="config/exchanges.yaml")
+    ap.add_argument("--out", default=PAGES_DIR)
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args(argv)
+
+    from bot import fetch_html
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        exchanges = [e for e in (yaml.safe_load(f) or {}).get("exchanges", []) if e.get("type") == "html"]
+
+    os.makedirs(args.out, exist_ok=True)
+    failed = 0
+    for cfg in exchanges:
+        path = page_path(cfg, args.out)
+        if os.path.exists(path) and not args.force:
+            print(f"{cfg['name']:<10} kept   {path}")
+            continue
+        try:
+            html = fetch_html(cfg["url"])
+        except Exception as e:
+            failed += 1
+            print(f"{cfg['name']:<10} error  {type(e).__name__}: {e}")
+            continue
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"{cfg['name']:<10} saved  {path} ({len(html) / 1024:.0f} KB)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Синтетические страницы для бенчмарков (детерминированные, seed по имени биржи).
+
+Похожи на реальные страницы анонсов: тяжёлая навигация/футер, много посторонних
+<a>, несколько десятков ссылок на анонсы, часть из них — листинги.
+Реальные сохранённые страницы лежат в bench/pages (python -m bench.fetch_pages) или
+в каталоге --fixtures DIR: файлы <имя биржи в нижнем регистре>.html.
+"""
+import os
+import random
+from typing import Dict, Any, Optional, Tuple
+
+WORDS = "market trade earn futures wallet support learn academy blog square pay card nft launchpad research".split()
+
+
+def _rng(name: str) -> random.Random:
+    return random.Random(sum(ord(c) * (i + 1) for i, c in enumerate(name)))
+
+
+def listing_page(cfg: Dict[str, Any], announcements: int = 60, noise_links: int = 1500) -> str:
+    r = _rng(cfg.get("name") or "x")
+    needle = cfg.get("link_contains") or "/announcement/"
+    kws = cfg.get("keywords_any") or ["will list"]
+
+    parts = ["<!DOCTYPE html><html><head><title>Announcements</title>"]
+    parts.append("<script>" + "var x=1;" * 2000 + "</script>")
+    parts.append("<style>" + ".a{color:red}" * 1000 + "</style></head><body>")
+
+    parts.append("<nav>")
+    for i in range(noise_links // 2):
+        w = r.choice(WORDS)
+        parts.append(f'<div class="menu-item"><a href="/{w}/{i}"><span>{w.title()}</span> <i>{i}</i></a></div>')
+    parts.append("</nav><main><section class=\"list\">")
+
+    for i in range(announcements):
+        code = f"{r.randrange(16**8):08x}"
+        sym = "".join(r.choice("ABCDEFGHJKLMNPQRSTUVWXYZ") for _ in range(r.randint(2, 5)))
+        if i % 3 == 0:
+            title = f"{cfg.get('name')} {r.choice(kws).title()} {sym.title()} ({sym})"
+        else:
+            title = f"Notice on {r.choice(WORDS)} maintenance #{i}"
+        parts.append(
+            f'<div class="item"><a class="title" href="{needle}{code}">'
+            f'<h3>{title}</h3><span class="date">2026-01-{1 + i % 28:02d}</span></a></div>'
+        )
+    parts.append("</section></main><footer>")
+
+    for i in range(noise_links - noise_links // 2):
+        w = r.choice(WORDS)
+        parts.append(f'<a href="https://example.com/{w}/{i}">{w} link {i}</a> ')
+    parts.append("</footer></body></html>")
+    return "".join(parts)
+
+
+def detail_page(title: str, body_words: int = 3000, contract: Optional[str] = None, seed: int = 0) -> str:
+    r = random.Random(seed)
+    nav = "".join(f'<a href="/{w}">{w}</a>' for w in WORDS * 40)
+    filler = " ".join(r.choice(WORDS) for _ in range(body_words))
+    extra = f"<p>Contract address: {contract}</p>" if contract else ""
+    return (
+        f"<html><head><title>{title}</title></head><body><nav>{nav}</nav>"
+        f'<article class="content"><h1>{title}</h1><p>{filler}</p>{extra}</article>'
+        f"<footer>{nav}</footer></body></html>"
+    )
+
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+
+def page_path(cfg: Dict[str, Any], fixtures_dir: Optional[str] = None) -> str:
+    return os.path.join(fixtures_dir or PAGES_DIR, f"{(cfg.get('name') or '').lower()}.html")
+
+
+def load_page(cfg: Dict[str, Any], fixtures_dir: Optional[str] = None) -> Tuple[str, bool]:
+    """(html, сохранённая ли это страница): сохранённая, если есть, иначе синтетическая."""
+    path = page_path(cfg, fixtures_dir)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read(), True
+    return listing_page(cfg), False
+
+
+def load_or_build(cfg: Dict[str, Any], fixtures_dir: Optional[str]) -> str:
+    return load_page(cfg, fixtures_dir)[0]
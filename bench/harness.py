@@ -0,0 +1,471 @@
+"""
+Офлайн-бенчмарк всего пайплайна: без настоящих бирж, CoinGecko, DexScreener и Telegram.
+
+    python -m bench.harness [--exchanges 40] [--currencies 400] [--new 3] [--mode async]
+                            [--load-ms 80] [--api-ms 30] [--chats 3] [--daemon-interval 5] [--json OUT]
+
+Что подменяется:
+  - модуль ccxt (и ccxt.async_support) — синтетические биржи с заданным числом валют
+    и задержкой load_markets; часть валют с контрактом в networks, часть без (идут в обогащение);
+  - локальный HTTP-сервер: страницы анонсов и детальные страницы (bench.fixtures) с ETag,
+    JSON-источник, CoinGecko (/search, /coins/list, /coins/{id}, /coins/markets),
+    DexScreener (/search) и Telegram (/bot<token>/sendMessage);
+  - адреса API берутся из COINGECKO_API / DEXSCREENER_API / TG_API, всё пишется во временный каталог.
+
+Фазы:
+  ccxt steady   — снапшоты всех бирж уже есть, ничего не изменилось (стоимость «пустого» запуска)
+  ccxt detect   — на каждой бирже появилось --new новых кодов; задержка = от старта скана
+                  до прихода алерта с этим тикером в фейковый Telegram
+  html cold/warm — первый проход по источникам анонсов и повторный (304 / тот же набор ссылок)
+  enrich cold/warm — enrich_many по пачке тикеров без кэша и с кэшем
+  daemon detect — daemon.py с тёплыми биржами (--daemon-interval), задержка от появления
+                  новых кодов до алерта
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from bench.fixtures import listing_page, detail_page
+
+
+# --- фейковые биржи ---
+
+class FakeUniverse:
+    def __init__(self, exchanges: int, currencies: int, load_ms: float, seed: int = 1):
+        self.ids = [f"fakex{i:03d}" for i in range(exchanges)]
+        self.load_seconds = load_ms / 1000.0
+        self.codes: Dict[str, List[str]] = {}
+        self._rng = random.Random(seed)
+        self._bumps = 0
+        for eid in self.ids:
+            self.codes[eid] = [f"C{j:04d}" for j in self._rng.sample(range(currencies * 3), currencies)]
+        self.new_codes: Dict[str, List[str]] = {}
+
+    def bump(self, n: int) -> Dict[str, List[str]]:
+        """Добавить по n новых кодов на каждую биржу."""
+        self._bumps += 1
+        self.new_codes = {}
+        for eid in self.ids:
+            fresh = [f"N{self._bumps}{eid[-3:]}{k}" for k in range(n)]
+            self.codes[eid] = self.codes[eid] + fresh
+            self.new_codes[eid] = fresh
+        return self.new_codes
+
+    def currencies(self, eid: str) -> Dict[str, Any]:
+        out = {}
+        for code in self.codes[eid]:
+            cur = {"id": code, "code": code, "info": {}}
+            # у половины валют контракт прямо в данных биржи
+            if int(hashlib.md5(code.encode()).hexdigest(), 16) % 2 == 0:
+                addr = "0x" + hashlib.sha1(code.encode()).hexdigest()
+                cur["networks"] = {"ERC20": {"info": {"contractAddress": addr}}}
+            out[code] = cur
+        return out
+
+
+def install_fake_ccxt(universe: FakeUniverse) -> None:
+    sync_mod = types.ModuleType("ccxt")
+    async_mod = types.ModuleType("ccxt.async_support")
+
+    def make_sync(eid: str):
+        class FakeExchange:
+            id = eid
+
+            def __init__(self, config=None):
+                self.currencies = {}
+
+            def load_markets(self, reload=False):
+                time.sleep(universe.load_seconds)
+                self.currencies = universe.currencies(eid)
+                return {}
+        FakeExchange.__name__ = eid
+        return FakeExchange
+
+    def make_async(eid: str):
+        class FakeAsyncExchange:
+            id = eid
+
+            def __init__(self, config=None):
+                self.currencies = {}
+
+            async def load_markets(self):
+                await asyncio.sleep(universe.load_seconds)
+                self.currencies = universe.currencies(eid)
+                return {}
+
+            async def close(self):
+                return None
+        FakeAsyncExchange.__name__ = eid
+        return FakeAsyncExchange
+
+    sync_mod.exchanges = list(universe.ids)
+    async_mod.exchanges = list(universe.ids)
+    for eid in universe.ids:
+        setattr(sync_mod, eid, make_sync(eid))
+        setattr(async_mod, eid, make_async(eid))
+    sync_mod.async_support = async_mod
+
+    sys.modules["ccxt"] = sync_mod
+    sys.modules["ccxt.async_support"] = async_mod
+
+
+# --- локальный сервер ---
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # клиенты рвут keep-alive соединения по завершении фазы — это не ошибка
+        pass
+
+
+class FakeServer:
+    def __init__(self, api_ms: float, html_sources: int):
+        self.api_seconds = api_ms / 1000.0
+        self.html_sources = html_sources
+        self.lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.messages: List[Dict[str, Any]] = []
+        self.httpd = _QuietServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self) -> None:
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def source_cfg(self, i: int) -> Dict[str, Any]:
+        return {
+            "name": f"Site{i}",
+            "type": "html",
+            "url": f"{self.base}/site/{i}/list",
+            "link_contains": f"/site/{i}/a/",
+            "keywords_any": ["will list", "new listing"],
+        }
+
+    def json_cfg(self) -> Dict[str, Any]:
+        return {
+            "name": "JsonSite",
+            "type": "json",
+            "url": f"{self.base}/site/json/list",
+            "items_path": "data.articles",
+            "fields": {"title": "title", "url": "code", "time": "ts"},
+            "url_template": self.base + "/site/json/a/{url}",
+            "keywords_any": ["will list"],
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):
+                pass
+
+            def _send(self, code: int, body: bytes, ctype: str = "application/json", headers=None):
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, obj: Any):
+                self._send(200, json.dumps(obj).encode())
+
+            def _page(self, html: str):
+                body = html.encode()
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", headers={"ETag": etag})
+                    return
+                self._send(200, body, "text/html; charset=utf-8", {"ETag": etag})
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(u.query).items()}
+                parts = [p for p in u.path.split("/") if p]
+
+                if parts[:1] == ["site"]:
+                    server.count("site")
+                    return self._site(parts[1:])
+
+                time.sleep(server.api_seconds)
+                if parts[:1] == ["cg"]:
+                    route = "/".join(parts[1:3])
+                    if route.startswith("coins/") and route not in ("coins/list", "coins/markets"):
+                        route = "coins/{id}"
+                    server.count("coingecko " + route)
+                    return self._coingecko(parts[1:], q)
+                if parts[:1] == ["dex"]:
+                    server.count("dexscreener search")
+                    sym = (q.get("q") or "").upper()
+                    return self._json({"pairs": [{
+                        "chainId": "ethereum", "dexId": "fakeswap", "url": f"https://dex.example/{sym}",
+                        "pairAddress": "0x" + hashlib.sha1(("pair" + sym).encode()).hexdigest(),
+                        "baseToken": {"address": "0x" + hashlib.sha1(("dex" + sym).encode()).hexdigest(), "symbol": sym},
+                    }]})
+                self._send(404, b"{}")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(server.api_seconds)
+                if "/sendMessage" in self.path:
+                    server.count("telegram sendMessage")
+                    try:
+                        d = json.loads(body or b"{}")
+                    except ValueError:
+                        d = {}
+                    with server.lock:
+                        server.messages.append({"t": time.time(), "chat": str(d.get("chat_id")), "text": d.get("text") or ""})
+                    return self._json({"ok": True, "result": {}})
+                self._send(404, b"{}")
+
+            def _site(self, parts: List[str]):
+                if parts[:1] == ["json"]:
+                    if parts[1:2] == ["list"]:
+                        r = random.Random(7)
+                        arts = [{"title": f"JsonSite Will List Tok{i} (TK{i})" if i % 2 == 0 else f"Maintenance {i}",
+                                 "code": f"{r.randrange(16**8):08x}", "ts": 1700000000 + i} for i in range(30)]
+                        return self._json({"data": {"articles": arts}})
+                    return self._page(detail_page(parts[-1], contract="0x" + hashlib.sha1(parts[-1].encode()).hexdigest()))
+
+                i = int(parts[0])
+                if parts[1:2] == ["list"]:
+                    return self._page(listing_page(server.source_cfg(i), announcements=60, noise_links=800))
+                code = parts[-1]
+                return self._page(detail_page(f"Will list {code}", contract="0x" + hashlib.sha1(code.encode()).hexdigest(), seed=len(code)))
+
+            def _coingecko(self, parts: List[str], q: Dict[str, str]):
+                if parts == ["search"]:
+                    sym = (q.get("query") or "").upper()
+                    return self._json({"coins": [{"id": sym.lower(), "symbol": sym, "name": sym, "market_cap_rank": 500}]})
+                if parts == ["coins", "list"]:
+                    # несколько монет: индекс строится, остальные тикеры идут через /search
+                    return self._json([
+                        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "platforms": {}},
+                        {"id": "tether", "symbol": "usdt", "name": "Tether",
+                         "platforms": {"ethereum": "0xdac17f958d2ee523a2206206994597c13d831ec7"}},
+                    ])
+                if parts == ["coins", "markets"]:
+                    ids = [i for i in (q.get("ids") or "").split(",") if i]
+                    return self._json([{"id": i, "market_cap": 1e6, "total_volume": 1e5} for i in ids])
+                if len(parts) == 2 and parts[0] == "coins":
+                    cid = parts[1]
+                    return self._json({"id": cid, "platforms": {"ethereum": "0x" + hashlib.sha1(("cg" + cid).encode()).hexdigest()}})
+                self._send(404, b"{}")
+
+        return Handler
+
+
+# --- отчёт ---
+
+def _pct(xs: List[float], p: float) -> Optional[float]:
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p * (len(xs) - 1))))]
+
+
+def _fmt(x: Optional[float], unit: str = "s") -> str:
+    return "-" if x is None else f"{x:.3f}{unit}"
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--exchanges", type=int, default=40)
+    ap.add_argument("--currencies", type=int, default=400)
+    ap.add_argument("--new", type=int, default=3, help="новых кодов на биржу в фазе detect")
+    ap.add_argument("--load-ms", type=float, default=80, help="задержка load_markets фейковой биржи")
+    ap.add_argument("--api-ms", type=float, default=30, help="задержка фейковых API")
+    ap.add_argument("--html-sources", type=int, default=8)
+    ap.add_argument("--html-max", type=int, default=20)
+    ap.add_argument("--enrich", type=int, default=200, help="тикеров в фазе enrich")
+    ap.add_argument("--chats", type=int, default=3)
+    ap.add_argument("--mode", default="async", choices=["serial", "async", "process"])
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--daemon-interval", type=float, default=5, help="DAEMON_CCXT_INTERVAL в фазе daemon")
+    ap.add_argument("--json", default=None, help="записать результаты в файл")
+    args = ap.parse_args(argv)
+
+    server = FakeServer(args.api_ms, args.html_sources)
+    server.start()
+
+    workdir = tempfile.mkdtemp(prefix="cex-bench-")
+    os.environ.update({
+        "COINGECKO_API": f"{server.base}/cg",
+        "DEXSCREENER_API": f"{server.base}/dex",
+        "TG_API": f"{server.base}/tg",
+        "TG_BOT_TOKEN": "bench",
+        "TG_CHAT_IDS": ",".join(str(1000 + i) for i in range(args.chats)),
+        "TG_CHAT_INTERVAL": "0.05",
+        "RATE_LIMITS": "127.0.0.1=1000:100:1000",
+        "STATE_BACKEND": "json",
+        "DIGEST_THRESHOLD": str(max(args.new, 3)),
+        "OUTBOX_PATH": os.path.join(workdir, "data", "outbox.jsonl"),
+        "CACHE_DB": os.path.join(workdir, "data", "cache.db"),
+        "CG_INDEX_PATH": os.path.join(workdir, "data", "cg_index.json.gz"),
+        # все биржи каждый запуск — фазы сравнимы между собой (адаптивный план — bench.bench_planner)
+        "PLAN_ADAPTIVE": "0",
+        "DAEMON_CCXT_INTERVAL": str(args.daemon_interval),
+        "DAEMON_COST_FACTOR": "1",
+        "DAEMON_HTML_INTERVAL": "3600",
+        "METRICS_PATH": os.path.join(workdir, "metrics.json"),
+        # фейковый ccxt есть только в памяти этого процесса — forkserver его не увидит
+        "CCXT_MP_START": "fork",
+    })
+    os.environ.pop("TG_CHAT_ID", None)
+
+    universe = FakeUniverse(args.exchanges, args.currencies, args.load_ms)
+    install_fake_ccxt(universe)
+
+    cwd = os.getcwd()
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "config"), exist_ok=True)
+    import yaml
+    with open(os.path.join(workdir, "config", "exchanges.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump({"exchanges": [server.source_cfg(i) for i in range(args.html_sources)] + [server.json_cfg()]}, f)
+    os.chdir(workdir)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        # импорт — только после подмены ccxt и env
+        import ccxt_watcher
+        import bot
+        from utils.coingecko import enrich_many
+        from utils.snapshots import normalize_codes, make_snapshot
+        from utils.state2 import load_state, save_state
+
+        # снапшоты «как после прошлых запусков»
+        state = load_state(ccxt_watcher.STATE_PATH)
+        now = time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())
+        for eid in universe.ids:
+            state["snapshots"][eid.upper()] = make_snapshot(None, normalize_codes(universe.codes[eid]), [], [], now)
+        save_state(ccxt_watcher.STATE_PATH, state)
+
+        def ccxt_run(name: str, new: Dict[str, List[str]]) -> None:
+            before = len(server.messages)
+            t0 = time.time()
+            ccxt_watcher.run_ccxt_scan(shard_index=0, shard_total=1, mode=args.mode, concurrency=args.concurrency)
+            dt = time.time() - t0
+
+            msgs = server.messages[before:]
+            lat = []
+            expected = [c for codes in new.values() for c in codes]
+            for code in expected:
+                pat = re.compile(r"\b" + re.escape(code) + r"\b")
+                hits = [m["t"] for m in msgs if pat.search(m["text"])]
+                if hits:
+                    lat.append(min(hits) - t0)
+            st = load_state(ccxt_watcher.STATE_PATH).get("exchange_stats", {})
+            results[name] = {
+                "seconds": dt,
+                "exchanges": sum(1 for e in universe.ids if (st.get(e) or {}).get("runs")),
+                "exchanges_per_sec": len(universe.ids) / dt if dt else None,
+                "alerts_expected": len(expected),
+                "alerts_delivered": len(lat),
+                "messages": len(msgs),
+                "latency_p50": _pct(lat, 0.5),
+                "latency_p95": _pct(lat, 0.95),
+            }
+
+        ccxt_run("ccxt steady", {})
+        ccxt_run("ccxt detect", universe.bump(args.new))
+
+        for name in ("html cold", "html warm"):
+            before = len(server.messages)
+            t0 = time.time()
+            bot.run_announcements_scan(max_messages=args.html_max)
+            dt = time.time() - t0
+            results[name] = {"seconds": dt, "messages": len(server.messages) - before}
+
+        tickers = [f"EN{i:04d}" for i in range(args.enrich)]
+        for name in ("enrich cold", "enrich warm"):
+            import utils.coingecko as cg
+            cg._CACHE_ENRICH.clear()
+            cg._CACHE_SEARCH.clear()
+            t0 = time.time()
+            out = enrich_many(tickers)
+            dt = time.time() - t0
+            results[name] = {
+                "seconds": dt,
+                "tickers": len(tickers),
+                "tickers_per_sec": len(tickers) / dt if dt else None,
+                "with_market_cap": sum(1 for v in out.values() if v.get("market_cap_usd")),
+            }
+
+        # daemon: биржи уже «тёплые», новый код ловится за интервал опроса, а не за запуск cron
+        import daemon
+        d = daemon.Daemon()
+        th = threading.Thread(target=d.run, daemon=True)
+        th.start()
+        warm_until = time.time() + 60
+        while time.time() < warm_until and len(d.next_ccxt) < len(universe.ids):
+            time.sleep(0.1)
+
+        before = len(server.messages)
+        new = universe.bump(args.new)
+        t0 = time.time()
+        expected = [c for codes in new.values() for c in codes]
+        lat: Dict[str, float] = {}
+        while time.time() < t0 + 60 and len(lat) < len(expected):
+            time.sleep(0.2)
+            msgs = server.messages[before:]
+            for code in expected:
+                if code not in lat:
+                    pat = re.compile(r"\b" + re.escape(code) + r"\b")
+                    hits = [m["t"] for m in msgs if pat.search(m["text"])]
+                    if hits:
+                        lat[code] = min(hits) - t0
+        d.stop()
+        th.join(30)
+        results["daemon detect"] = {
+            "seconds": time.time() - t0,
+            "alerts_expected": len(expected),
+            "alerts_delivered": len(lat),
+            "messages": len(server.messages) - before,
+            "latency_p50": _pct(list(lat.values()), 0.5),
+            "latency_p95": _pct(list(lat.values()), 0.95),
+        }
+    finally:
+        os.chdir(cwd)
+        server.stop()
+
+    print(f"{'phase':<14} {'seconds':>9} {'items':>7} {'rate/s':>9} {'lat p50':>9} {'lat p95':>9} {'msgs':>5}")
+    for name, r in results.items():
+        items = r.get("alerts_delivered", r.get("tickers", r.get("messages", "")))
+        if "alerts_expected" in r:
+            items = f"{r['alerts_delivered']}/{r['alerts_expected']}"
+        rate = r.get("exchanges_per_sec") or r.get("tickers_per_sec")
+        print(
+            f"{name:<14} {r['seconds']:>9.3f} {str(items):>7} {_fmt(rate, ''):>9} "
+            f"{_fmt(r.get('latency_p50')):>9} {_fmt(r.get('latency_p95')):>9} {r.get('messages', ''):>5}"
+        )
+    print("api calls: " + ", ".join(f"{k}={v}" for k, v in sorted(server.calls.items())))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "api_calls": server.calls}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,28 @@
 import os
-import json
 import hashlib
-import requests
-import yaml
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import time
+from typing import Optional
 
 from ccxt_watcher import run_ccxt_scan
 from utils.state import load_seen, save_seen
-from utils.tg import send_telegram_message
+from utils.state2 import load_state, save_state, CCXT_STATE_PATH
+from utils.planner import current_epoch, is_due, record_result, record_listings
+from utils.outbox import get_outbox, message_id
+from utils.digest import Coalescer, pack_messages, html_escape
 from utils.parse import summarize
-from utils.coingecko import enrich
+from utils.coingecko import enrich_many
+from utils import httpclient, metrics
+from utils.cache import DiskCache
+from utils.links import extract_links
+from utils import sources as announcement_sources
+from utils.detail import parse_selectors, extract_stream, CHUNK
 
 HEADERS = {"User-Agent": "Mozilla/5.0 (cex-listing-bot)"}
-PENDING_HTML_PATH = "data/pending_html.json"
+
+# текст детальной страницы по URL: анонс не меняется, второй раз не качаем
+# version 2 — приоритет content_selector (раньше брался первый совпавший элемент по документу)
+_DETAIL_CACHE = DiskCache("detail_text", version=2)
+DETAIL_TTL = 30 * 24 * 3600
 
 
 def stable_id(exchange: str, url: str, title: str) -> str:
@@ -21,90 +30,53 @@ def stable_id(exchange: str, url: str, title: str) -> str:
     return hashlib.sha256(base).hexdigest()[:24]
 
 
-def _msg_id(text: str, parse_mode: str) -> str:
-    base = f"{parse_mode}||{text}".encode("utf-8")
-    return hashlib.sha256(base).hexdigest()[:24]
-
-
-def _load_json_list(path: str) -> list[dict]:
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            x = json.load(f)
-        if isinstance(x, list):
-            return [i for i in x if isinstance(i, dict) and i.get("text")]
-    except Exception:
-        pass
-    return []
-
-
-def _save_json_list(path: str, items: list[dict]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(items, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
-
-
-def _pending_add_unique(pending: list[dict], text: str, parse_mode: str, max_items: int = 200) -> None:
-    pid = _msg_id(text, parse_mode)
-    ids = set([x.get("id") for x in pending if x.get("id")])
-    if pid in ids:
-        return
-    pending.append({"id": pid, "text": text, "parse_mode": parse_mode})
-    if len(pending) > max_items:
-        pending[:] = pending[-max_items:]
-
-
 def fetch_html(url: str) -> str:
-    r = requests.get(url, timeout=30, headers=HEADERS)
+    r = httpclient.get(url, timeout=30, headers=HEADERS)
     r.raise_for_status()
     return r.text
 
 
-def parse_listing_links(cfg: dict) -> list[dict]:
-    html = fetch_html(cfg["url"])
-    soup = BeautifulSoup(html, "lxml")
+def parse_listing_links(cfg: dict, html: Optional[str] = None) -> list[dict]:
+    if html is None:
+        html = fetch_html(cfg["url"])
+    return extract_links(html, cfg)
 
-    items = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        text = a.get_text(" ", strip=True)
 
-        if cfg.get("link_contains") and (cfg["link_contains"] not in href):
-            continue
-
-        if href.startswith("/"):
-            href = urljoin(cfg["url"], href)
-
-        if not text:
-            continue
-
-        low = text.lower()
-        kws = [k.lower() for k in cfg.get("keywords_any", [])]
-        if kws and not any(k in low for k in kws):
-            continue
-
-        items.append({"title": text, "url": href})
+def fetch_detail_text(url: str, cfg: Optional[dict] = None) -> str:
+    """
+    Текст статьи анонса (content_selector биржи, см. utils/detail.py).
+    Ответ читается потоком и закрывается, как только статья закончилась.
+    """
+    hit, cached = _DETAIL_CACHE.get(url, DETAIL_TTL)
+    if hit and cached:
+        metrics.inc("detail_cache", result="hit")
+        return cached
+    metrics.inc("detail_cache", result="miss")
 
-    seen_urls = set()
-    out = []
-    for it in items:
-        if it["url"] in seen_urls:
-            continue
-        seen_urls.add(it["url"])
-        out.append(it)
-
-    return out[:40]
-
-
-def fetch_detail_text(url: str) -> str:
     try:
-        html = fetch_html(url)
-    except Exception:
+        r = httpclient.get(url, timeout=30, headers=HEADERS, stream=True)
+    except Exception as e:
+        metrics.inc("detail_errors", error=type(e).__name__)
+        return ""
+    try:
+        r.raise_for_status()
+        # скачивание и разбор идут одним потоком — время общее
+        with metrics.timer("html_parse_seconds", kind="detail"):
+            text = extract_stream(
+                r.iter_content(CHUNK),
+                parse_selectors((cfg or {}).get("content_selector")),
+                # без charset в заголовке requests подставит ISO-8859-1 — пусть lxml смотрит <meta>
+                encoding=r.encoding if "charset" in (r.headers.get("Content-Type") or "").lower() else None,
+            )
+    except Exception as e:
+        metrics.inc("detail_errors", error=type(e).__name__)
         return ""
-    soup = BeautifulSoup(html, "lxml")
-    return soup.get_text("\n", strip=True)[:20000]
+    finally:
+        r.close()
+
+    if text:
+        _DETAIL_CACHE.set(url, text)
+    return text
 
 
 def fmt_money(x):
@@ -123,131 +95,228 @@ def fmt_money(x):
     return f"${x:.2f}"
 
 
-def _html_escape(s: str) -> str:
-    if s is None:
-        return ""
-    return (
-        str(s)
-        .replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-    )
-
-
-def _flush_pending_html(pending: list[dict], max_to_send: int = 2) -> list[dict]:
-    if not pending:
-        return pending
-
-    still = []
-    sent = 0
-    for item in pending:
-        if sent >= max_to_send:
-            still.append(item)
-            continue
-        text = item.get("text") or ""
-        ok = send_telegram_message(text, parse_mode="HTML", disable_web_page_preview=True)
-        if ok:
-            sent += 1
-        else:
-            still.append(item)
-    return still
+def build_html_alert(ex_name: str, it: dict, ticker, contract, cg: dict) -> str:
+    mc = cg.get("market_cap_usd")
+    vol = cg.get("volume_24h_usd")
 
+    contract_final = contract
+    if not contract_final:
+        plats = cg.get("platform_contracts") or {}
+        for chain, addr in plats.items():
+            if addr:
+                contract_final = addr
+                break
 
-def run_announcements_scan(max_messages: int) -> None:
-    with open("config/exchanges.yaml", "r", encoding="utf-8") as f:
+    lines = []
+    lines.append("🆕 <b>NEW LISTING</b>")
+    lines.append(f"<b>Exchange:</b> {html_escape(ex_name.upper())}")
+    lines.append(f"<b>Ticker:</b> {html_escape((ticker or 'n/a').upper())}")
+    if contract_final:
+        lines.append(f"<b>Contract:</b> <code>{html_escape(contract_final)}</code>")
+    else:
+        lines.append("<b>Contract:</b> n/a")
+    lines.append(f"<b>24h Vol:</b> {html_escape(fmt_money(vol))}")
+    lines.append(f"<b>MCap:</b> {html_escape(fmt_money(mc))}")
+    lines.append(f"<b>Link:</b> {html_escape(it['url'])}")
+
+    return "\n".join(lines)
+
+
+def build_html_digest(ex_name: str, items: list[dict]) -> list[str]:
+    """Пачка анонсов одной биржи -> HTML-сообщения (каждое <= 4096 символов)."""
+    header = f"🆕 <b>{html_escape(ex_name)}</b>: {len(items)} new listing announcements"
+    lines = []
+    for f in items:
+        line = f"• <a href=\"{html_escape(f['it']['url'])}\">{html_escape(f['it']['title'])}</a>"
+        if f.get("ticker"):
+            line += f" — <b>{html_escape(f['ticker'])}</b>"
+        if f.get("contract"):
+            line += f" <code>{html_escape(f['contract'])}</code>"
+        lines.append(line)
+    return pack_messages(header, lines, "HTML")
+
+
+def load_sources(path: str = "config/exchanges.yaml") -> list[dict]:
+    import yaml
+
+    with open(path, "r", encoding="utf-8") as f:
         cfg = yaml.safe_load(f) or {}
-
     exchanges = cfg.get("exchanges", []) or []
-
-    seen = load_seen()
+    return [ex for ex in exchanges if announcement_sources.is_supported(ex)]
+
+
+def run_announcements_scan(
+    max_messages: int,
+    sources: Optional[list[dict]] = None,
+    seen: Optional[set] = None,
+    source_stats: Optional[dict] = None,
+) -> None:
+    """
+    sources — по умолчанию источники из config/exchanges.yaml, у которых подошла очередь
+      (utils.planner.is_due: источники с анонсами — каждый запуск, молчащие — реже).
+    seen — уже загруженный набор id (daemon держит его в памяти); дополняется на месте.
+    source_stats — state["source_stats"] (daemon держит в памяти); без него читается
+      из state ccxt и сохраняется туда же в конце.
+    """
+    state = None
+    if source_stats is None:
+        state = load_state(CCXT_STATE_PATH)
+        source_stats = state.setdefault("source_stats", {})
+    epoch = current_epoch()
+
+    if sources is None:
+        sources = [ex for ex in load_sources() if is_due(source_stats, ex["name"].strip(), epoch)]
+
+    if seen is None:
+        seen = load_seen()
     new_seen = set(seen)
 
-    pending = _load_json_list(PENDING_HTML_PATH)
-    pending = _flush_pending_html(pending, max_to_send=2)
-
-    sent = 0
+    outbox = get_outbox()
 
-    for ex in exchanges:
-        if sent >= max_messages:
-            break
-        if ex.get("type") != "html":
-            continue
-
-        ex_name = (ex.get("name") or "").strip()
-        if not ex_name:
-            continue
+    # 1) детект: все источники (html-страницы, json API) параллельно
+    # (304 / тот же набор ссылок -> None: ни парсинга дальше, ни detail-запросов)
+    scan_seconds: dict[str, float] = {}
 
+    def scan(ex: dict):
+        t = time.time()
         try:
-            links = parse_listing_links(ex)
-        except Exception:
+            return announcement_sources.scan_source(ex)
+        finally:
+            scan_seconds[ex["name"].strip()] = time.time() - t
+
+    pages = httpclient.fetch_all(sources, scan, url_of=lambda ex: ex["url"])
+
+    detected = time.time()
+
+    found = []
+    per_source: dict[str, int] = {}
+    for ex, page in zip(sources, pages):
+        ex_name = ex["name"].strip()
+        record_result(source_stats, ex_name, scan_seconds.get(ex_name, 0.0), ok=not isinstance(page, Exception), epoch=epoch)
+        if isinstance(page, Exception):
+            # источник упал — считаем и пишем, остальные источники не страдают
+            metrics.inc("source_errors", source=ex_name, error=type(page).__name__)
+            print(f"[html] {ex_name}: {type(page).__name__}: {page}")
+            continue
+        if page is None:
             continue
 
-        for it in links:
-            if sent >= max_messages:
+        for it in page["links"]:
+            if len(found) >= max_messages:
                 break
 
             sid = stable_id(ex_name, it["url"], it["title"])
             if sid in seen:
                 continue
+            found.append({"ex_name": ex_name, "cfg": ex, "it": it, "sid": sid})
+            per_source[ex_name] = per_source.get(ex_name, 0) + 1
+
+    # heat источника — только по взятым в работу ссылкам: не влезшие в max_messages
+    # будут посчитаны в том запуске, где их обработают
+    for ex in sources:
+        record_listings(source_stats, ex["name"].strip(), per_source.get(ex["name"].strip(), 0))
+    metrics.inc("html_found", len(found))
+
+    # детальные страницы новых ссылок — тоже параллельно (с лимитом на host);
+    # json-источник может отдать текст анонса сразу (fields.body) — тогда без запроса
+    details = httpclient.fetch_all(
+        found,
+        lambda f: f["it"].get("body") or fetch_detail_text(f["it"]["url"], f["cfg"]),
+        url_of=lambda f: f["it"]["url"],
+    )
+    for f, detail_text in zip(found, details):
+        if isinstance(detail_text, Exception):
+            metrics.inc("detail_errors", error=type(detail_text).__name__)
+            detail_text = ""
+        f["ticker"], f["contract"] = summarize(f["it"]["title"], detail_text)
+
+    # 2) обогащение одной пачкой (/coins/markets до 250 id за запрос)
+    tickers = [f["ticker"] for f in found if f["ticker"]]
+    contracts = {f["ticker"]: f["contract"] for f in found if f["ticker"] and f["contract"]}
+    with metrics.timer("enrich_seconds", source="coingecko_markets"):
+        enriched = enrich_many(tickers, contracts) if tickers else {}
+
+    # 3) отправка; пачка с одной биржи (больше DIGEST_THRESHOLD) — одним digest
+    digest = Coalescer()
+    for ex_name in {f["ex_name"] for f in found}:
+        digest.mark(ex_name, sum(1 for f in found if f["ex_name"] == ex_name))
+
+    for f in found:
+        if digest.add(f["ex_name"], f):
+            new_seen.add(f["sid"])
+            continue
+
+        cg = enriched.get((f["ticker"] or "").upper()) or {}
+        msg = build_html_alert(f["ex_name"], f["it"], f["ticker"], f["contract"], cg)
 
-            detail_text = fetch_detail_text(it["url"])
-            ticker, contract = summarize(it["title"], detail_text)
-
-            mc = vol = None
-            cg_contract_hint = None
-
-            if ticker:
-                cg = enrich(ticker)
-                mc = cg.get("market_cap_usd")
-                vol = cg.get("volume_24h_usd")
-                plats = cg.get("platform_contracts") or {}
-                for chain, addr in plats.items():
-                    if addr:
-                        cg_contract_hint = f"{chain}:{addr}"
-                        break
-
-            contract_final = contract
-            if not contract_final and cg_contract_hint and ":" in cg_contract_hint:
-                contract_final = cg_contract_hint.split(":", 1)[1]
-
-            lines = []
-            lines.append("🆕 <b>NEW LISTING</b>")
-            lines.append(f"<b>Exchange:</b> {_html_escape(ex_name.upper())}")
-            lines.append(f"<b>Ticker:</b> {_html_escape((ticker or 'n/a').upper())}")
-            if contract_final:
-                lines.append(f"<b>Contract:</b> <code>{_html_escape(contract_final)}</code>")
-            else:
-                lines.append("<b>Contract:</b> n/a")
-            lines.append(f"<b>24h Vol:</b> {_html_escape(fmt_money(vol))}")
-            lines.append(f"<b>MCap:</b> {_html_escape(fmt_money(mc))}")
-            lines.append(f"<b>Link:</b> {_html_escape(it['url'])}")
-
-            msg = "\n".join(lines)
-
-            ok = send_telegram_message(msg, parse_mode="HTML", disable_web_page_preview=True)
-            if ok:
-                sent += 1
-            else:
-                _pending_add_unique(pending, msg, "HTML", max_items=200)
-
-            new_seen.add(sid)
+        # в outbox до отправки: не дошедшее досылается в следующих запусках
+        outbox.deliver(msg, "HTML", msg_id=f"html:{f['sid']}")
+        metrics.observe("alert_latency_seconds", time.time() - detected, source="html")
+        new_seen.add(f["sid"])
+
+    def send_digest(ex_name: str, items: list[dict]) -> None:
+        for text in build_html_digest(ex_name, items):
+            outbox.deliver(text, "HTML", msg_id=f"html-digest:{message_id(text, 'HTML')}")
+        for _ in items:
+            metrics.observe("alert_latency_seconds", time.time() - detected, source="html")
+
+    digest.flush(send_digest)
 
     if new_seen != seen:
-        save_seen(new_seen)
+        save_seen(new_seen, known=seen)
+        seen.update(new_seen)
+
+    # страница считается обработанной, только если все её ссылки уже в seen
+    for ex, page in zip(sources, pages):
+        if not isinstance(page, dict):
+            continue
+        ex_name = ex["name"].strip()
+        if all(stable_id(ex_name, it["url"], it["title"]) in new_seen for it in page["links"]):
+            announcement_sources.commit_state(ex, page["state"])
+
+    if state is not None:
+        save_state(CCXT_STATE_PATH, state)
+
+
+SCAN_MODES = ("all", "ccxt", "html")
 
-    _save_json_list(PENDING_HTML_PATH, pending)
+
+def scan_mode() -> str:
+    """SCAN_MODE из окружения; опечатка не должна тихо превращать запуск в пустой."""
+    mode = (os.getenv("SCAN_MODE") or "all").strip().lower()
+    if mode not in SCAN_MODES:
+        raise SystemExit(f"SCAN_MODE={mode!r}: expected one of {', '.join(SCAN_MODES)}")
+    return mode
 
 
 def main():
+    """
+    SCAN_MODE: "all" (по умолчанию) — ccxt в каждом шарде, html-анонсы в шарде 0;
+    "ccxt" — только ccxt; "html" — только анонсы (ccxt не импортируется вовсе), тоже
+    только в шарде 0: в остальных шардах матрицы запуск ничего не делает, иначе алерты
+    ушли бы по разу из каждого шарда.
+    """
     shard_index = int(os.getenv("SHARD_INDEX", "0"))
     shard_total = int(os.getenv("SHARD_TOTAL", "4"))
+    mode = scan_mode()
 
-    run_ccxt_scan(shard_index=shard_index, shard_total=shard_total)
-
-    if shard_index == 0:
-        html_max = int(os.getenv("HTML_MAX_MSG", "4"))
-        run_announcements_scan(max_messages=html_max)
+    outbox = get_outbox()
+    try:
+        with metrics.timer("phase_seconds", phase="drain"):
+            outbox.drain()
+        if mode in ("all", "ccxt"):
+            with metrics.timer("phase_seconds", phase="ccxt"):
+                run_ccxt_scan(shard_index=shard_index, shard_total=shard_total)
+
+        if mode in ("all", "html") and shard_index == 0:
+            html_max = int(os.getenv("HTML_MAX_MSG", "4"))
+            with metrics.timer("phase_seconds", phase="html"):
+                run_announcements_scan(max_messages=html_max)
+    finally:
+        outbox.close()
+        metrics.gauge("outbox_pending", len(outbox.pending_ids()))
+        # METRICS_PATH (JSON) и METRICS_PROM (textfile), см. utils/metrics.py
+        metrics.write()
 
 
 if __name__ == "__main__":
@@ -1,33 +1,43 @@
-import ccxt
+import os
 import time
 import traceback
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timezone
 
-from utils.state2 import load_state, save_state
-from utils.tg import send_telegram_message
-from utils.parse import pick_best_contract, extract_contracts
-from utils.coingecko import enrich, search_coin
+from utils import metrics, breaker
+from utils.state2 import load_state, save_state, CCXT_STATE_PATH
+from utils.ccxt_loader import load_serial, load_async, load_process, BUDGET
+from utils.planner import plan_shard, record_result, record_listings, seed_heat, current_epoch
+from utils.snapshots import normalize_codes, codes_hash, diff_codes, make_snapshot
+from utils.outbox import get_outbox, message_id
+from utils.digest import Coalescer, pack_messages, mdv2_escape, mdv2_code
+from utils.enrich_queue import EnrichmentPipeline
+from utils.cache import DiskCache, STATIC_TTL
+from utils.parse import pick_best_contract, scan_contracts, MIN_CONFIDENCE
+from utils.coingecko import platform_contracts, is_provisional
+from utils.cg_index import id_for_contract
 from utils.dexscreener import (
     search as dex_search,
     extract_contract_from_pair,
     extract_pair_url,
 )
 
-STATE_PATH = "data/seen_ccxt.json"
+STATE_PATH = CCXT_STATE_PATH
+
+# `import ccxt` грузит модули всех бирж (ccxt/__init__ импортирует каждую, ~0.6 с),
+# поэтому ccxt импортируется только когда план шарда не пуст, а список бирж для планировщика
+# берётся из state["meta"]["ccxt_exchanges"] (обновляется при смене версии пакета).
 DEFAULT_SKIP = {"USDT", "USDC", "BTC", "ETH", "BNB", "SOL"}
 
+# ticker -> [contract, chain, coingecko_id, dex_url]
+# version 2 — сбросить записи, взятые по символу из локального индекса без /search
+_RESOLVE_CACHE = DiskCache("resolve", version=2)
+
 
 def _as_dict(x) -> dict:
     return x if isinstance(x, dict) else {}
 
 
-def _mdv2_escape(s: str) -> str:
-    for ch in r"_*[]()~`>#+-=|{}.!":
-        s = s.replace(ch, "\\" + ch)
-    return s
-
-
 def _safe_get_contract_and_chain_from_currency(currency: dict) -> Tuple[Optional[str], Optional[str]]:
     """
     Пытаемся достать contract (+chain/network, если есть) из ccxt currency object.
@@ -80,55 +90,85 @@ def _safe_get_contract_and_chain_from_currency(currency: dict) -> Tuple[Optional
     return best, None
 
 
-def resolve_contract_chain_and_refs(
-    ticker: str,
-    currency_obj: dict
-) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+def resolve_local(currency_obj: dict) -> Tuple[Optional[str], Optional[str]]:
     """
-    Returns: (contract, chain, coingecko_id, dex_url)
-    chain — если удалось достать (например ETH/BSC/SOL etc), иначе None
+    Contract/chain только из данных самой биржи — без сетевых запросов.
+    Returns: (contract, chain) или (None, None)
     """
-    t = (ticker or "").upper().strip()
-    if not t:
-        return None, None, None, None
-
     currency_obj = currency_obj if isinstance(currency_obj, dict) else {}
 
     # 1) exchange metadata (best)
     contract, chain = _safe_get_contract_and_chain_from_currency(currency_obj)
     if contract:
-        return contract, chain, None, None
+        return contract, chain
 
-    # 2) raw scan of info
+    # 2) raw scan of info (сеть — если сканер нашёл подсказку рядом с адресом)
     raw = str(currency_obj.get("info") or "")
-    cands = extract_contracts(raw)
-    contract = pick_best_contract(cands)
-    if contract:
-        # chain тут обычно неизвестен
-        return contract, None, None, None
+    cands = [c for c in scan_contracts(raw) if c[2] >= MIN_CONFIDENCE]
+    if cands:
+        contract, chain, _ = cands[0]
+        return contract, (chain if chain not in ("evm", "move") else None)
+
+    return None, None
 
+
+def compact_currency(currency: dict) -> dict:
+    """
+    Ужатый currency object (для передачи из worker-процесса):
+    только то, что потом читает resolve_contract_chain_and_refs.
+    """
+    contract, chain = resolve_local(currency)
+    if not contract:
+        return {}
+    info = {"contractAddress": contract}
+    if chain:
+        info["network"] = chain
+    return {"info": info}
+
+
+def resolve_remote(ticker: str) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+    """
+    CoinGecko, затем DexScreener; найденное кэшируется между запусками.
+    Промахи кэшируют уровнем ниже (search_coin / dex search) — там ошибку
+    API можно отличить от «не нашли».
+    Returns: (contract, chain, coingecko_id, dex_url)
+    """
+    t = (ticker or "").upper().strip()
+    if not t:
+        return None, None, None, None
+
+    hit, cached = _RESOLVE_CACHE.get(t, STATIC_TTL)
+    if hit and cached:
+        return tuple(cached)
+
+    res = _resolve_remote_uncached(t)
+    # ответ по устаревшему индексу (при недоступном /search) надолго не запоминаем
+    if res[0] and not is_provisional(t):
+        _RESOLVE_CACHE.set(t, list(res))
+    return res
+
+
+def _resolve_remote_uncached(t: str) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
     coingecko_id = None
 
-    # 3) CoinGecko
+    # 3) CoinGecko (локальный индекс, затем API)
     try:
-        hit = search_coin(t)
-        if hit and hit.get("id"):
-            coingecko_id = hit["id"]
-
-        cg = enrich(t)
-        plats = cg.get("platform_contracts") or {}
+        with metrics.timer("enrich_seconds", source="coingecko"):
+            coingecko_id, plats = platform_contracts(t)
         # plats: { "ethereum": "0x...", "binance-smart-chain": "0x..." ... }
         if isinstance(plats, dict):
             for ch, addr in plats.items():
                 if isinstance(addr, str) and addr:
                     chain = ch if isinstance(ch, str) and ch else None
+                    metrics.inc("enrich_hits", source="coingecko")
                     return addr, chain, coingecko_id, None
-    except Exception:
-        pass
+    except Exception as e:
+        metrics.inc("enrich_errors", source="coingecko", error=type(e).__name__)
 
     # 4) DexScreener
     try:
-        pair = dex_search(t)
+        with metrics.timer("enrich_seconds", source="dexscreener"):
+            pair = dex_search(t)
         addr = extract_contract_from_pair(pair)
         url = extract_pair_url(pair)
         # chain может быть внутри pair (зависит от твоей реализации utils.dexscreener)
@@ -137,13 +177,39 @@ def resolve_contract_chain_and_refs(
             chain = pair.get("chainId") or pair.get("chain") or pair.get("network")
             if isinstance(chain, str):
                 chain = chain.strip() or None
+        if addr:
+            metrics.inc("enrich_hits", source="dexscreener")
         return addr, chain, coingecko_id, url
-    except Exception:
-        pass
+    except Exception as e:
+        metrics.inc("enrich_errors", source="dexscreener", error=type(e).__name__)
 
+    metrics.inc("enrich_misses")
     return None, None, coingecko_id, None
 
 
+def resolve_remote_batch(tickers: List[str]) -> Dict[str, Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]]:
+    return {t: resolve_remote(t) for t in tickers}
+
+
+def resolve_contract_chain_and_refs(
+    ticker: str,
+    currency_obj: dict
+) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+    """
+    Returns: (contract, chain, coingecko_id, dex_url)
+    chain — если удалось достать (например ETH/BSC/SOL etc), иначе None
+    """
+    t = (ticker or "").upper().strip()
+    if not t:
+        return None, None, None, None
+
+    contract, chain = resolve_local(currency_obj)
+    if contract:
+        return contract, chain, None, None
+
+    return resolve_remote(t)
+
+
 def build_message(
     exchange_id: str,
     ticker: str,
@@ -151,26 +217,27 @@ def build_message(
     chain: Optional[str],
     cg_id: Optional[str],
     dex_url: Optional[str],
-    found_at: str
+    found_at: str,
+    relisted: bool = False,
 ) -> str:
-    ex_up = _mdv2_escape((exchange_id or "").upper())
-    t = _mdv2_escape(ticker or "")
-    fa = _mdv2_escape(found_at or "")
+    ex_up = mdv2_escape((exchange_id or "").upper())
+    t = mdv2_escape(ticker or "")
+    fa = mdv2_escape(found_at or "")
 
     if contract:
-        c = f"`{_mdv2_escape(contract)}`"
+        c = mdv2_code(contract)
     else:
         c = "n/a"
 
     lines = [
-        "🆕 *NEW* \\(CCXT DETECTED\\)",
+        "🔁 *RELISTED* \\(CCXT DETECTED\\)" if relisted else "🆕 *NEW* \\(CCXT DETECTED\\)",
         f"*Exchange:* {ex_up}",
         f"*Ticker:* {t}",
     ]
 
     # chain показываем только если есть
     if chain:
-        lines.append(f"*Chain:* {_mdv2_escape(chain)}")
+        lines.append(f"*Chain:* {mdv2_escape(chain)}")
 
     lines += [
         f"*Contract:* {c}",
@@ -178,87 +245,343 @@ def build_message(
     ]
 
     if cg_id:
-        lines.append(f"*CoinGecko ID:* {_mdv2_escape(cg_id)}")
+        lines.append(f"*CoinGecko ID:* {mdv2_escape(cg_id)}")
     if dex_url:
-        lines.append(f"*DexScreener:* {_mdv2_escape(dex_url)}")
+        lines.append(f"*DexScreener:* {mdv2_escape(dex_url)}")
     return "\n".join(lines)
 
 
-def run_ccxt_scan(
-    shard_index: int = 0,
-    shard_total: int = 4,
-    max_exchanges_per_run: int = 35,
-    skip_common_on_first_run: bool = True,
-) -> None:
-    # ---- HARD limits to always finish before GitHub timeout ----
-    start = time.time()
-    MAX_SECONDS = 6 * 60              # whole shard budget (6 min)
-    MAX_EXCHANGE_SECONDS = 30         # budget per exchange (30 sec)
-
-    state = load_state(STATE_PATH)
-    seen_map: Dict[str, str] = state["seen"]
+def _deliver_alert(record: Dict[str, Any], resolved: Optional[tuple]) -> None:
+    contract, chain, cg_id, dex_url = resolved or (None, None, None, None)
+    if contract and not cg_id:
+        # контракт с биржи — id из локального индекса, без запросов
+        try:
+            cg_id = id_for_contract(contract)
+        except Exception:
+            pass
+    # outbox пишет сообщение на диск до отправки — снапшот биржи можно сохранять,
+    # не дошедшее до какого-то чата досылается в следующих запусках только туда
+    get_outbox().deliver(
+        build_message(
+            record["exchange"], record["ticker"],
+            contract, chain, cg_id, dex_url,
+            record["found_at"], relisted=record.get("relisted", False),
+        ),
+        "MarkdownV2",
+        msg_id=f"ccxt:{record['exchange']}:{record['ticker']}:{record['found_at']}",
+    )
+    _observe_latency(record)
+
+
+def _observe_latency(record: Dict[str, Any]) -> None:
+    # от обнаружения в списке валют до отправки (включая обогащение)
+    if record.get("detected"):
+        metrics.observe("alert_latency_seconds", time.time() - record["detected"], source="ccxt")
+
+
+def build_digest(exchange_id: str, items: List[Dict[str, Any]]) -> List[str]:
+    """Пачка алертов одной биржи -> MarkdownV2-сообщения (каждое <= 4096 символов)."""
+    header = f"🆕 *NEW* \\(CCXT DETECTED\\) — *{mdv2_escape((exchange_id or '').upper())}*: {len(items)}"
+
+    lines = []
+    for it in sorted(items, key=lambda x: x["ticker"]):
+        contract, chain, _, _ = it.get("resolved") or (None, None, None, None)
+        line = f"• *{mdv2_escape(it['ticker'])}*"
+        if chain:
+            line += f" · {mdv2_escape(chain)}"
+        if contract:
+            line += f" · {mdv2_code(contract)}"
+        if it.get("relisted"):
+            line += " 🔁"
+        lines.append(line)
+
+    lines.append(f"*Found:* {mdv2_escape(items[0]['found_at'])}")
+    return pack_messages(header, lines, "MarkdownV2")
+
+
+def _deliver_digest(exchange_id: str, items: List[Dict[str, Any]]) -> None:
+    for text in build_digest(exchange_id, items):
+        get_outbox().deliver(text, "MarkdownV2", msg_id=f"ccxt-digest:{message_id(text, 'MarkdownV2')}")
+    for it in items:
+        _observe_latency(it)
+
+
+def _make_deliver(digest: Coalescer):
+    # биржа в режиме burst — запись копится до digest, иначе обычный алерт
+    def deliver(record: Dict[str, Any], resolved: Optional[tuple]) -> None:
+        if not digest.add(record["exchange"], dict(record, resolved=resolved)):
+            _deliver_alert(record, resolved)
+    return deliver
+
+
+def _process_exchange(
+    eid: str,
+    currencies: Dict[str, Any],
+    snapshots: Dict[str, Any],
+    pipeline: EnrichmentPipeline,
+    deliver,
+    digest: Coalescer,
+    first_run: bool,
+    skip_common_on_first_run: bool,
+    deadline: float,
+    ex_deadline: float,
+) -> int:
+    """Возвращает число новых листингов (для heat в utils.planner)."""
+    ex_key = (eid or "").upper()
+    prev = snapshots.get(ex_key)
+
+    with metrics.timer("ccxt_diff_seconds"):
+        codes = normalize_codes(currencies.keys())
+        if not codes:
+            return 0
+        # список валют не менялся — проходить по нему незачем
+        if prev and prev.get("hash") == codes_hash(codes):
+            metrics.inc("ccxt_unchanged")
+            return 0
+
+        # нормализованный тикер -> исходный ключ в currencies
+        raw_code: Dict[str, str] = {}
+        for code in currencies.keys():
+            if isinstance(code, str):
+                raw_code.setdefault(code.upper().strip(), code)
+
+        added, removed = diff_codes(prev, codes)
+    metrics.inc("ccxt_added", len(added))
+    metrics.inc("ccxt_removed", len(removed))
+    gone = (prev or {}).get("gone") or {}
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+    # сколько алертов будет: больше DIGEST_THRESHOLD — одним digest-сообщением
+    expected = len(added)
+    if first_run and skip_common_on_first_run:
+        expected -= sum(1 for t in added if t in DEFAULT_SKIP)
+    digest.mark(eid, expected)
+
+    done = []
+    try:
+        for ticker in added:
+            if time.time() > deadline:
+                break
+            if time.time() > ex_deadline:
+                break
 
-    ids = ccxt.exchanges
-    shard_ids = [eid for i, eid in enumerate(ids) if (i % shard_total) == shard_index]
-    shard_ids = shard_ids[:max_exchanges_per_run]
+            done.append(ticker)
 
-    first_run = (len(seen_map) == 0)
+            if first_run and skip_common_on_first_run and ticker in DEFAULT_SKIP:
+                continue
 
-    for eid in shard_ids:
-        if time.time() - start > MAX_SECONDS:
+            record = {
+                "exchange": eid,
+                "ticker": ticker,
+                "found_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC"),
+                "relisted": ticker in gone,
+                "detected": time.time(),
+            }
+
+            contract, chain = resolve_local(currencies.get(raw_code.get(ticker, ticker)))
+            if contract:
+                deliver(record, (contract, chain, None, None))
+            else:
+                pipeline.submit(ticker, record)
+    finally:
+        if removed:
+            print(f"[ccxt] {ex_key}: delisted {len(removed)}: {', '.join(removed[:20])}")
+
+        # не успели обработать все новые — недообработанные останутся новыми в следующий раз
+        if len(done) < len(added):
+            kept = set((prev or {}).get("codes") or []) - set(removed)
+            codes = sorted(kept | set(done))
+
+        snapshots[ex_key] = make_snapshot(prev, codes, done, removed, now)
+
+    # первый снимок биржи — не листинги
+    return len(done) if prev else 0
+
+
+def import_ccxt(async_support: bool = False):
+    """Импорт ccxt (или ccxt.async_support) с замером времени в метриках."""
+    name = "ccxt.async_support" if async_support else "ccxt"
+    with metrics.timer("import_seconds", module=name):
+        import ccxt
+        if async_support:
+            import ccxt.async_support
+    return ccxt.async_support if async_support else ccxt
+
+
+def _ccxt_version() -> Optional[str]:
+    try:
+        from importlib.metadata import version
+        return version("ccxt")
+    except Exception:
+        return None
+
+
+def exchange_ids(state: Dict[str, Any]) -> List[str]:
+    """Список бирж ccxt; без импорта ccxt, если в state есть список для установленной версии."""
+    meta = state.setdefault("meta", {})
+    cached = meta.get("ccxt_exchanges") or {}
+    version = _ccxt_version()
+    if version and cached.get("version") == version and cached.get("ids"):
+        return list(cached["ids"])
+
+    ccxt = import_ccxt()
+    ids = list(ccxt.exchanges)
+    meta["ccxt_exchanges"] = {"version": version or getattr(ccxt, "__version__", None), "ids": ids}
+    return ids
+
+
+def process_results(
+    results,
+    state: Dict[str, Any],
+    epoch: int,
+    deadline: float,
+    per_exchange_seconds: float,
+    serial: bool = False,
+    first_run: bool = False,
+    skip_common_on_first_run: bool = True,
+) -> int:
+    """
+    Результаты загрузчика (utils.ccxt_loader) -> статистика, снимки, алерты.
+    state меняется на месте; сохраняет вызывающий. Общая часть run_ccxt_scan и daemon.
+    Возвращает число обработанных бирж.
+    """
+    snapshots: Dict[str, Any] = state["snapshots"]
+    stats: Dict[str, Any] = state.setdefault("exchange_stats", {})
+    health: Dict[str, Any] = state.setdefault("exchange_health", {})
+
+    # обогащение (CoinGecko/DexScreener) идёт параллельно с детектом
+    digest = Coalescer()
+    deliver = _make_deliver(digest)
+    pipeline = EnrichmentPipeline(
+        resolve_remote_batch,
+        deliver,
+        workers=int(os.getenv("ENRICH_WORKERS", "4")),
+        batch_size=int(os.getenv("ENRICH_BATCH", "10")),
+        max_seconds=float(os.getenv("ENRICH_MAX_SECONDS", "45")),
+    )
+
+    processed = 0
+    for res in results:
+        eid = res["id"]
+        currencies = res["currencies"]
+        if res.get("error") == BUDGET:
+            # не загружалась из-за общего deadline — не её неудача, план возьмёт её первой в след. раз
+            metrics.inc("ccxt_budget_skipped", exchange=eid)
+            continue
+        record_result(stats, eid, res["seconds"], ok=bool(currencies), epoch=epoch)
+        metrics.observe("ccxt_load_seconds", res["seconds"])
+        metrics.gauge("ccxt_exchange_load_seconds", round(res["seconds"], 3), exchange=eid)
+        if res.get("error"):
+            metrics.inc("ccxt_load_errors", exchange=eid, error=res["error"])
+        if breaker.record(health, eid, res["seconds"], res.get("error"), epoch) == breaker.OPEN:
+            metrics.inc("breaker_trips", exchange=eid)
+            print(f"[ccxt] {eid}: breaker open until run {health[eid]['open_until']} ({health[eid]['error']})")
+
+        if time.time() > deadline:
             break
+        if not currencies:
+            continue
 
-        ex_start = time.time()
+        # в serial режиме загрузка уже съела часть бюджета биржи
+        ex_deadline = time.time() + per_exchange_seconds
+        if serial:
+            ex_deadline -= res["seconds"]
 
         try:
-            ex_class = getattr(ccxt, eid)
-            ex = ex_class({
-                "enableRateLimit": True,
-                "timeout": 12000,  # reduce hanging
-            })
-
-            # load_markets can hang — keep exchange budget
-            try:
-                ex.load_markets()
-            except Exception:
-                pass
-
-            if time.time() - ex_start > MAX_EXCHANGE_SECONDS:
-                continue
-
-            currencies: Dict[str, Any] = getattr(ex, "currencies", None) or {}
-            if not isinstance(currencies, dict) or not currencies:
-                continue
-
-            for code, ccy in currencies.items():
-                if time.time() - start > MAX_SECONDS:
-                    break
-                if time.time() - ex_start > MAX_EXCHANGE_SECONDS:
-                    break
-
-                ticker = (code or "").upper().strip()
-                if not ticker:
-                    continue
-
-                if first_run and skip_common_on_first_run and ticker in DEFAULT_SKIP:
-                    continue
-
-                key = f"{(eid or '').upper()}:{ticker}"
-                if key in seen_map:
-                    continue
+            new = _process_exchange(
+                eid, currencies, snapshots, pipeline, deliver, digest,
+                first_run, skip_common_on_first_run,
+                deadline, ex_deadline,
+            )
+            record_listings(stats, eid, new)
+            processed += 1
+        except Exception as e:
+            metrics.inc("ccxt_process_errors", exchange=eid, error=type(e).__name__)
+            traceback.print_exc()
+            continue
 
-                found_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-                seen_map[key] = found_at
+    # немного времени на хвост обогащения, даже если детект выбрал весь бюджет
+    pipeline.close(max(deadline, time.time() + 15))
+    digest.flush(_deliver_digest)
+    return processed
 
-                contract, chain, cg_id, dex_url = resolve_contract_chain_and_refs(ticker, ccy)
 
-                send_telegram_message(
-                    build_message(eid, ticker, contract, chain, cg_id, dex_url, found_at),
-                    parse_mode="MarkdownV2"
-                )
+def run_ccxt_scan(
+    shard_index: int = 0,
+    shard_total: int = 4,
+    max_exchanges_per_run: Optional[int] = None,
+    skip_common_on_first_run: bool = True,
+    mode: Optional[str] = None,
+    concurrency: Optional[int] = None,
+) -> None:
+    """
+    mode:
+      "serial" — биржи по одной (по умолчанию)
+      "async"  — ccxt.async_support, до `concurrency` бирж параллельно
+      "process" — каждая биржа в своём процессе (до `concurrency`), по дедлайну процесс убивается
+    По умолчанию берётся из CCXT_SCAN_MODE / CCXT_CONCURRENCY.
+
+    Набор бирж шарда считает utils.planner по state["exchange_stats"]
+    (время загрузки/ошибки прошлых запусков) из бирж, не отключённых breaker'ом
+    (state["exchange_health"]); max_exchanges_per_run — только доп. ограничение.
+    """
+    # ---- HARD limits to always finish before GitHub timeout ----
+    start = time.time()
+    MAX_SECONDS = 6 * 60              # whole shard budget (6 min)
+    MAX_EXCHANGE_SECONDS = 30         # budget per exchange (30 sec)
+    deadline = start + MAX_SECONDS
 
-        except Exception:
-            traceback.print_exc()
-            continue
+    mode = (mode or os.getenv("CCXT_SCAN_MODE") or "serial").strip().lower()
+    if concurrency is None:
+        concurrency = int(os.getenv("CCXT_CONCURRENCY", "16"))
 
+    state = load_state(STATE_PATH)
+    snapshots: Dict[str, Any] = state["snapshots"]
+    stats: Dict[str, Any] = state.setdefault("exchange_stats", {})
+    health: Dict[str, Any] = state.setdefault("exchange_health", {})
+
+    epoch = current_epoch()
+    seed_heat(stats, snapshots)
+    # биржи с открытым breaker (см. utils/breaker.py) в план не попадают
+    all_ids = exchange_ids(state)
+    candidates = breaker.allowed(all_ids, health, epoch)
+    metrics.gauge("breaker_open", len(all_ids) - len(candidates))
+    parallel = 1 if mode == "serial" else max(1, concurrency)
+    shard_ids = plan_shard(
+        candidates,
+        stats,
+        shard_index=shard_index,
+        shard_total=shard_total,
+        epoch=epoch,
+        shard_capacity=MAX_SECONDS * 0.8 * parallel,
+        max_rotation=int(os.getenv("CCXT_MAX_ROTATION", "6")),
+        max_exchanges=max_exchanges_per_run,
+    )
+
+    first_run = (len(snapshots) == 0)
+
+    if not shard_ids:
+        # нечего сканировать — ccxt даже не импортируем
+        save_state(STATE_PATH, state)
+        return
+
+    # загрузчики импортируют ccxt сами; здесь — чтобы замерить импорт
+    # (в process-режиме дети получают ccxt из forkserver, см. utils/ccxt_loader.py)
+    import_ccxt(async_support=(mode == "async"))
+
+    if mode == "async":
+        results = load_async(shard_ids, concurrency, MAX_EXCHANGE_SECONDS, deadline)
+    elif mode == "process":
+        results = load_process(shard_ids, concurrency, MAX_EXCHANGE_SECONDS, deadline, compact=compact_currency)
+    else:
+        results = load_serial(shard_ids, MAX_EXCHANGE_SECONDS, deadline)
+
+    process_results(
+        results, state, epoch, deadline, MAX_EXCHANGE_SECONDS,
+        serial=(mode == "serial"),
+        first_run=first_run,
+        skip_common_on_first_run=skip_common_on_first_run,
+    )
+    metrics.gauge("ccxt_exchanges_planned", len(shard_ids))
+    metrics.gauge("ccxt_scan_seconds", round(time.time() - start, 3))
     save_state(STATE_PATH, state)
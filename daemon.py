@@ -0,0 +1,171 @@
+import os
+import signal
+import time
+from typing import Dict, Any, List
+
+from bot import run_announcements_scan, load_sources, scan_mode
+from ccxt_watcher import process_results, exchange_ids, STATE_PATH
+from utils import breaker, httpclient, metrics
+from utils.ccxt_loader import WarmExchanges
+from utils.outbox import get_outbox
+from utils.planner import current_epoch, exchange_cost, rotation, seed_heat
+from utils.state import load_seen
+from utils.state2 import load_state, save_state
+
+# Долгоживущий режим вместо запуска bot.py по cron:
+#
+#   python daemon.py
+#
+# В памяти живут экземпляры бирж ccxt (utils.ccxt_loader.WarmExchanges), HTTP-пулы,
+# state снимков и seen html-анонсов; каждый источник опрашивается по своему интервалу.
+# State пишется после каждого цикла, в котором что-то обработано (sqlite — только изменённые
+# записи, поэтому с демоном лучше STATE_BACKEND=sqlite).
+#
+#   DAEMON_CCXT_INTERVAL   — сек между перезагрузками currencies горячей биржи (120); спящие
+#                            (по heat, см. utils/planner.py) — реже, медленные — не чаще,
+#                            чем раз в DAEMON_COST_FACTOR * avg_seconds
+#   DAEMON_HTML_INTERVAL   — сек между опросами html/json-источника (60); в exchanges.yaml — interval
+#   DAEMON_CYCLE_SECONDS   — бюджет одного ccxt-цикла (60)
+#   DAEMON_EXCHANGES       — список бирж через запятую (по умолчанию все ccxt.exchanges)
+#   SCAN_MODE              — all / ccxt / html, как у bot.py
+#   DAEMON_METRICS_INTERVAL — как часто переписывать METRICS_PATH / METRICS_PROM (60)
+
+CCXT_INTERVAL = float(os.getenv("DAEMON_CCXT_INTERVAL", "120"))
+HTML_INTERVAL = float(os.getenv("DAEMON_HTML_INTERVAL", "60"))
+COST_FACTOR = float(os.getenv("DAEMON_COST_FACTOR", "10"))
+CYCLE_SECONDS = float(os.getenv("DAEMON_CYCLE_SECONDS", "60"))
+EXCHANGE_SECONDS = 30
+DRAIN_INTERVAL = 60.0
+METRICS_INTERVAL = float(os.getenv("DAEMON_METRICS_INTERVAL", "60"))
+TICK = 1.0
+
+
+class Daemon:
+    def __init__(self):
+        self.stopping = False
+        self.state = load_state(STATE_PATH)
+        self.seen = load_seen()
+        self.outbox = get_outbox()
+        self.warm = WarmExchanges(workers=int(os.getenv("CCXT_CONCURRENCY", "16")))
+
+        mode = scan_mode()
+        env_ids = [x.strip() for x in (os.getenv("DAEMON_EXCHANGES") or "").split(",") if x.strip()]
+        self.exchange_ids: List[str] = []
+        if mode in ("all", "ccxt"):
+            self.exchange_ids = env_ids or exchange_ids(self.state)
+        self.sources = load_sources() if mode in ("all", "html") else []
+        self.html_max = int(os.getenv("HTML_MAX_MSG", "4"))
+        self.first_run = len(self.state["snapshots"]) == 0
+        seed_heat(self.state.setdefault("exchange_stats", {}), self.state["snapshots"])
+
+        # ключ -> unix time следующего опроса; при старте всё «просрочено»
+        self.next_ccxt: Dict[str, float] = {}
+        self.next_html: Dict[str, float] = {}
+        self.next_drain = 0.0
+        self.next_metrics = time.time() + METRICS_INTERVAL
+
+    def stop(self, *_args) -> None:
+        self.stopping = True
+
+    # --- расписание ---
+
+    def _ccxt_interval(self, eid: str) -> float:
+        # горячие биржи — каждые DAEMON_CCXT_INTERVAL, спящие — в rotation() раз реже (utils.planner)
+        stats = self.state.get("exchange_stats") or {}
+        return max(CCXT_INTERVAL * rotation(stats, eid), COST_FACTOR * exchange_cost(stats, eid))
+
+    def _due_exchanges(self, now: float) -> List[str]:
+        busy = set(self.warm.busy())
+        health = self.state.setdefault("exchange_health", {})
+        due = [e for e in self.exchange_ids if self.next_ccxt.get(e, 0) <= now and e not in busy]
+        due = breaker.allowed(due, health, current_epoch())
+        # самые просроченные первыми
+        due.sort(key=lambda e: self.next_ccxt.get(e, 0))
+        return due
+
+    def _due_sources(self, now: float) -> List[Dict[str, Any]]:
+        return [ex for ex in self.sources if self.next_html.get(ex["name"].strip(), 0) <= now]
+
+    # --- циклы ---
+
+    def ccxt_cycle(self, eids: List[str]) -> None:
+        started = time.time()
+        deadline = started + CYCLE_SECONDS
+        results = self.warm.load(eids, EXCHANGE_SECONDS, deadline)
+        with metrics.timer("daemon_cycle_seconds", source="ccxt"):
+            process_results(
+                results, self.state, current_epoch(), deadline, EXCHANGE_SECONDS,
+                first_run=self.first_run,
+            )
+        for eid in eids:
+            self.next_ccxt[eid] = started + self._ccxt_interval(eid)
+        self.first_run = False
+        save_state(STATE_PATH, self.state)
+
+    def html_cycle(self, sources: List[Dict[str, Any]]) -> None:
+        started = time.time()
+        try:
+            with metrics.timer("daemon_cycle_seconds", source="html"):
+                run_announcements_scan(
+                    self.html_max, sources=sources, seen=self.seen,
+                    source_stats=self.state.setdefault("source_stats", {}),
+                )
+        except Exception as e:
+            metrics.inc("daemon_errors", source="html", error=type(e).__name__)
+            print(f"[daemon] html: {type(e).__name__}: {e}")
+        stats = self.state.get("source_stats") or {}
+        for ex in sources:
+            name = ex["name"].strip()
+            self.next_html[name] = started + float(ex.get("interval") or HTML_INTERVAL) * rotation(stats, name)
+        save_state(STATE_PATH, self.state)
+
+    def tick(self) -> bool:
+        """Один проход планировщика; False — делать было нечего."""
+        now = time.time()
+        worked = False
+
+        if now >= self.next_drain:
+            self.outbox.drain(deadline=now + 10)
+            self.next_drain = now + DRAIN_INTERVAL
+
+        eids = self._due_exchanges(now)
+        if eids or self.warm.has_ready():
+            try:
+                self.ccxt_cycle(eids)
+            except Exception as e:
+                metrics.inc("daemon_errors", source="ccxt", error=type(e).__name__)
+                print(f"[daemon] ccxt: {type(e).__name__}: {e}")
+            worked = True
+
+        sources = self._due_sources(time.time())
+        if sources:
+            self.html_cycle(sources)
+            worked = True
+
+        if time.time() >= self.next_metrics:
+            metrics.write()
+            self.next_metrics = time.time() + METRICS_INTERVAL
+        return worked
+
+    def run(self) -> None:
+        try:
+            while not self.stopping:
+                if not self.tick():
+                    time.sleep(TICK)
+        finally:
+            save_state(STATE_PATH, self.state)
+            self.outbox.close()
+            metrics.write()
+            self.warm.close()
+            httpclient.close_all()
+
+
+def main():
+    d = Daemon()
+    signal.signal(signal.SIGTERM, d.stop)
+    signal.signal(signal.SIGINT, d.stop)
+    d.run()
+
+
+if __name__ == "__main__":
+    main()
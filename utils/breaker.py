@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+# Circuit breaker по биржам: state["exchange_health"]
+#   { eid: {"failures": int,        — неудач подряд
+#           "error": str | None,    — класс последней ошибки ("RequestTimeout", "deadline", "slow", ...)
+#           "latency": float,       — время последней загрузки, сек
+#           "open_until": int,      — номер запуска (epoch), до которого биржа пропускается
+#           "trips": int,           — сколько раз breaker открывался
+#           "last_ok": int | None} }
+#
+# closed    — биржа сканируется как обычно;
+# open      — после BREAKER_THRESHOLD неудач подряд (для «жёстких» ошибок — сразу) биржа
+#             пропускается 2^(trips-1) запусков, не больше BREAKER_MAX_RUNS;
+# half-open — срок вышел: следующий скан — проба. Успех закрывает breaker, неудача
+#             открывает его снова на вдвое больший срок.
+# Медленная загрузка (дольше BREAKER_SLOW_SECONDS) считается неудачей, хотя её результат используется,
+# но сбрасывает trips: медленная, но рабочая биржа пропускает не больше одного запуска подряд.
+# Биржи, до которых не дошла очередь из-за deadline шарда (utils.ccxt_loader.BUDGET), не учитываются.
+#
+# Время — в номерах запусков (utils.planner.current_epoch), а не в секундах: все шарды
+# одного запуска видят одинаковое состояние и считают одинаковый план.
+#
+#   python -m utils.breaker [--all]   — отчёт по состоянию
+
+THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "3"))
+MAX_RUNS = int(os.getenv("BREAKER_MAX_RUNS", "72"))
+SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", "20"))
+
+# гео-блок, отключённый API — повторять каждый запуск бессмысленно
+HARD_ERRORS = {"PermissionDenied", "AccountSuspended", "ExchangeNotAvailable", "NotSupported"}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+def status(health: Dict[str, Any], eid: str, epoch: int) -> str:
+    h = health.get(eid)
+    if not isinstance(h, dict) or not h.get("open_until"):
+        return CLOSED
+    return OPEN if epoch < int(h["open_until"]) else HALF_OPEN
+
+
+def allowed(eids: List[str], health: Dict[str, Any], epoch: int) -> List[str]:
+    """Биржи, которые можно сканировать в запуске epoch (closed и half-open)."""
+    return [e for e in eids if status(health, e, epoch) != OPEN]
+
+
+def record(
+    health: Dict[str, Any],
+    eid: str,
+    seconds: float,
+    error: Optional[str],
+    epoch: int,
+) -> str:
+    """Учесть результат загрузки; возвращает новое состояние breaker."""
+    h = health.get(eid)
+    if not isinstance(h, dict):
+        h = {"failures": 0, "error": None, "latency": 0.0, "open_until": 0, "trips": 0, "last_ok": None}
+        health[eid] = h
+
+    h["latency"] = round(float(seconds), 3)
+    if error is None and seconds > SLOW_SECONDS:
+        # данные загружены, просто медленно: нарастающий срок не копится,
+        # breaker откроется не больше чем на 1 запуск
+        error = "slow"
+        h["trips"] = 0
+
+    if error is None:
+        h.update(failures=0, error=None, open_until=0, trips=0, last_ok=int(epoch))
+        return CLOSED
+
+    probe = bool(h.get("open_until"))
+    h["failures"] = int(h.get("failures", 0)) + 1
+    h["error"] = error
+    if probe or h["failures"] >= THRESHOLD or error in HARD_ERRORS:
+        h["trips"] = int(h.get("trips", 0)) + 1
+        h["open_until"] = int(epoch) + 1 + min(MAX_RUNS, 2 ** (h["trips"] - 1))
+        return OPEN
+    return CLOSED
+
+
+def report(health: Dict[str, Any], epoch: int, show_all: bool = False) -> List[str]:
+    rows = []
+    for eid, h in sorted(health.items(), key=lambda kv: (-int((kv[1] or {}).get("failures", 0)), kv[0])):
+        if not isinstance(h, dict):
+            continue
+        st = status(health, eid, epoch)
+        if st == CLOSED and not h.get("failures") and not show_all:
+            continue
+        left = max(0, int(h.get("open_until") or 0) - epoch) if st == OPEN else 0
+        rows.append(
+            f"{eid:<24} {st:<9} {int(h.get('failures', 0)):>5} {int(h.get('trips', 0)):>5} "
+            f"{left:>9} {float(h.get('latency', 0.0)):>8.2f}  {h.get('error') or '-':<22} "
+            f"{h.get('last_ok') if h.get('last_ok') is not None else '-'}"
+        )
+    return rows
+
+
+def main(argv: List[str]) -> int:
+    """
+    python -m utils.breaker [--all]
+    Состояние breaker по биржам (по умолчанию — только с неудачами).
+    reopen_in — сколько запусков осталось до пробного скана (half-open).
+    """
+    from utils.planner import current_epoch
+    from utils.state2 import load_state, CCXT_STATE_PATH
+
+    if any(a in ("-h", "--help") for a in argv):
+        print(main.__doc__)
+        return 0
+
+    health = load_state(CCXT_STATE_PATH).get("exchange_health") or {}
+    epoch = current_epoch()
+    rows = report(health, epoch, show_all="--all" in argv)
+
+    n_open = sum(1 for e in health if status(health, e, epoch) == OPEN)
+    n_half = sum(1 for e in health if status(health, e, epoch) == HALF_OPEN)
+    print(f"epoch {epoch} ({time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime())}): "
+          f"{len(health)} exchanges, {n_open} open, {n_half} half-open")
+    if rows:
+        print(f"{'exchange':<24} {'state':<9} {'fails':>5} {'trips':>5} {'reopen_in':>9} {'latency':>8}  {'error':<22} last_ok")
+        print("\n".join(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,138 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple, Dict
+
+# Дисковый кэш между запусками (sqlite, data/cache.db).
+#   - namespace + version: смена версии формата = все старые записи промах
+#   - TTL задаётся при чтении (у статичных и волатильных данных он разный)
+#   - negative caching: value=None тоже кэшируется, со своим (коротким) TTL
+#   - LRU: при превышении max_items выкидываются давно не читанные записи
+#
+# В отличие от utils.store это именно кэш: потерять его не страшно,
+# в git он не коммитится (в workflow — actions/cache).
+
+CACHE_DB = os.getenv("CACHE_DB", "data/cache.db")
+
+# контракты/платформы/id почти не меняются; mcap/volume — быстро
+STATIC_TTL = float(os.getenv("CACHE_STATIC_TTL", str(7 * 24 * 3600)))
+VOLATILE_TTL = float(os.getenv("CACHE_VOLATILE_TTL", "900"))
+NEGATIVE_TTL = float(os.getenv("CACHE_NEGATIVE_TTL", str(6 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    ns       TEXT NOT NULL,
+    key      TEXT NOT NULL,
+    version  INTEGER NOT NULL,
+    value    TEXT,
+    fetched  REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_lru ON cache (ns, accessed);
+"""
+
+_EVICT_EVERY = 200
+
+_CONN: Optional[sqlite3.Connection] = None
+_CONN_LOCK = threading.Lock()
+
+
+def _conn() -> sqlite3.Connection:
+    global _CONN
+    if _CONN is None:
+        d = os.path.dirname(CACHE_DB)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        c = sqlite3.connect(CACHE_DB, timeout=30, check_same_thread=False)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.executescript(_SCHEMA)
+        _CONN = c
+    return _CONN
+
+
+def _disabled() -> bool:
+    return os.getenv("DISABLE_DISK_CACHE", "").lower() in ("1", "true", "yes")
+
+
+class DiskCache:
+    def __init__(self, namespace: str, version: int = 1, max_items: int = 20000):
+        self.ns = namespace
+        self.version = version
+        self.max_items = max_items
+        self._sets = 0
+
+    def get(self, key: str, ttl: float, negative_ttl: Optional[float] = None) -> Tuple[bool, Any]:
+        """
+        (hit, value). hit=False — промах/протухло; hit=True, value=None — закэшированный «не нашли».
+        """
+        if _disabled():
+            return False, None
+        now = time.time()
+        with _CONN_LOCK:
+            try:
+                c = _conn()
+                row = c.execute(
+                    "SELECT version, value, fetched FROM cache WHERE ns = ? AND key = ?",
+                    (self.ns, key),
+                ).fetchone()
+                if not row or row[0] != self.version:
+                    return False, None
+
+                value = json.loads(row[1]) if row[1] is not None else None
+                max_age = ttl if value is not None else (negative_ttl if negative_ttl is not None else ttl)
+                if now - row[2] > max_age:
+                    return False, None
+
+                c.execute(
+                    "UPDATE cache SET accessed = ? WHERE ns = ? AND key = ?",
+                    (now, self.ns, key),
+                )
+                c.commit()
+                return True, value
+            except Exception:
+                return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        if _disabled():
+            return
+        now = time.time()
+        with _CONN_LOCK:
+            try:
+                c = _conn()
+                c.execute(
+                    "INSERT OR REPLACE INTO cache (ns, key, version, value, fetched, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        self.ns, key, self.version,
+                        None if value is None else json.dumps(value, ensure_ascii=False, separators=(",", ":")),
+                        now, now,
+                    ),
+                )
+                self._sets += 1
+                if self._sets >= _EVICT_EVERY:
+                    self._sets = 0
+                    self._evict(c)
+                c.commit()
+            except Exception:
+                pass
+
+    def _evict(self, c: sqlite3.Connection) -> None:
+        n = c.execute("SELECT COUNT(*) FROM cache WHERE ns = ?", (self.ns,)).fetchone()[0]
+        extra = n - self.max_items
+        if extra > 0:
+            c.execute(
+                "DELETE FROM cache WHERE ns = ? AND key IN "
+                "(SELECT key FROM cache WHERE ns = ? ORDER BY accessed LIMIT ?)",
+                (self.ns, self.ns, extra),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with _CONN_LOCK:
+            try:
+                n = _conn().execute("SELECT COUNT(*) FROM cache WHERE ns = ?", (self.ns,)).fetchone()[0]
+            except Exception:
+                n = 0
+        return {"namespace": self.ns, "version": self.version, "items": n, "max_items": self.max_items}
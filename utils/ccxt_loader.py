@@ -0,0 +1,391 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait as futures_wait, FIRST_COMPLETED
+from multiprocessing.connection import wait as mp_wait
+from typing import Dict, Any, List, Optional, Iterator, Callable
+
+# Один результат загрузки биржи:
+#   {"id": eid, "currencies": {...} | None, "seconds": float, "error": str | None}
+LoadResult = Dict[str, Any]
+
+EXCHANGE_TIMEOUT_MS = 12000  # reduce hanging
+
+# error для биржи, которую не загрузили из-за общего deadline шарда (не дошла очередь или
+# загрузку прервали раньше её собственного лимита). Это не её неудача: ни breaker, ни
+# статистика планировщика такой результат не учитывают.
+BUDGET = "budget"
+
+# Способ запуска процессов load_process. fork небезопасен: к моменту, когда генератор
+# читают, в родителе уже работают потоки (обогащение, отправка в Telegram), и ребёнок
+# может унаследовать чужую захваченную блокировку (sqlite-кэш, logging, пул requests,
+# лимитер) и висеть до дедлайна. forkserver форкает детей из отдельного однопоточного
+# процесса, в котором ccxt уже импортирован.
+MP_START = os.getenv("CCXT_MP_START", "forkserver")
+
+
+def _result(eid: str, currencies, seconds: float, error: Optional[str]) -> LoadResult:
+    if not isinstance(currencies, dict) or not currencies:
+        currencies = None
+        if error is None:
+            error = "no currencies"
+    return {"id": eid, "currencies": currencies, "seconds": seconds, "error": error}
+
+
+def load_serial(
+    eids: List[str],
+    per_exchange_seconds: float,
+    deadline: float,
+) -> Iterator[LoadResult]:
+    """
+    Старый режим: биржи по одной, синхронный ccxt.
+    Генератор — чтобы обработка шла сразу после загрузки каждой биржи.
+    """
+    import ccxt
+
+    for eid in eids:
+        if time.time() > deadline:
+            break
+
+        ex_start = time.time()
+        error = None
+        currencies = None
+        try:
+            ex_class = getattr(ccxt, eid)
+            ex = ex_class({
+                "enableRateLimit": True,
+                "timeout": EXCHANGE_TIMEOUT_MS,
+            })
+
+            # load_markets can hang — keep exchange budget
+            try:
+                ex.load_markets()
+            except Exception as e:
+                error = type(e).__name__
+
+            currencies = getattr(ex, "currencies", None) or {}
+        except Exception as e:
+            error = type(e).__name__
+
+        seconds = time.time() - ex_start
+        if seconds > per_exchange_seconds:
+            currencies, error = None, "deadline"
+
+        yield _result(eid, currencies, seconds, error)
+
+
+async def _load_one_async(
+    ccxt_async, eid: str, sem: asyncio.Semaphore, per_exchange_seconds: float, started: Dict[str, float],
+) -> LoadResult:
+    async with sem:
+        started[eid] = time.time()
+        ex_start = time.time()
+        ex = None
+        error = None
+        currencies = None
+        try:
+            ex_class = getattr(ccxt_async, eid)
+            ex = ex_class({
+                "enableRateLimit": True,
+                "timeout": min(EXCHANGE_TIMEOUT_MS, int(per_exchange_seconds * 1000)),
+            })
+            await asyncio.wait_for(ex.load_markets(), timeout=per_exchange_seconds)
+            currencies = getattr(ex, "currencies", None) or {}
+        except asyncio.TimeoutError:
+            error = "deadline"
+        except Exception as e:
+            # markets могли не загрузиться, но currencies уже есть
+            error = type(e).__name__
+            if ex is not None:
+                currencies = getattr(ex, "currencies", None) or {}
+        finally:
+            if ex is not None:
+                try:
+                    await ex.close()
+                except Exception:
+                    pass
+
+        return _result(eid, currencies, time.time() - ex_start, error)
+
+
+async def _load_all_async(eids: List[str], concurrency: int, per_exchange_seconds: float, deadline: float) -> List[LoadResult]:
+    import ccxt.async_support as ccxt_async
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    started: Dict[str, float] = {}   # eid -> начало загрузки (после семафора)
+    tasks = [
+        asyncio.ensure_future(_load_one_async(ccxt_async, eid, sem, per_exchange_seconds, started))
+        for eid in eids
+    ]
+
+    remaining = max(0.0, deadline - time.time())
+    done, pending = await asyncio.wait(tasks, timeout=remaining)
+    for t in pending:
+        t.cancel()
+    if pending:
+        # дать отменённым задачам закрыть сессии
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    by_id: Dict[str, LoadResult] = {}
+    for t in done:
+        if t.cancelled() or t.exception() is not None:
+            continue
+        r = t.result()
+        by_id[r["id"]] = r
+
+    # не дождались до deadline шарда: своё время загрузки (0 — если так и не начали)
+    now = time.time()
+    out = []
+    for eid in eids:
+        out.append(by_id.get(eid) or _result(eid, None, now - started.get(eid, now), BUDGET))
+    return out
+
+
+def load_async(
+    eids: List[str],
+    concurrency: int,
+    per_exchange_seconds: float,
+    deadline: float,
+) -> Iterator[LoadResult]:
+    """
+    Параллельная загрузка через ccxt.async_support: до `concurrency` бирж одновременно,
+    у каждой свой дедлайн, у всех вместе — общий `deadline`.
+    Результаты отдаются в исходном порядке eids.
+    """
+    if not eids:
+        return iter(())
+    results = asyncio.run(_load_all_async(eids, concurrency, per_exchange_seconds, deadline))
+    return iter(results)
+
+
+def _process_worker(eid: str, conn, timeout_ms: int, compact: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]) -> None:
+    """
+    Выполняется в дочернем процессе. Шлёт родителю (currencies, error);
+    currencies уже ужаты через `compact`, чтобы не гонять через pipe весь info.
+    """
+    currencies = None
+    error = None
+    try:
+        import ccxt
+
+        ex = getattr(ccxt, eid)({
+            "enableRateLimit": True,
+            "timeout": timeout_ms,
+        })
+        try:
+            ex.load_markets()
+        except Exception as e:
+            error = type(e).__name__
+        currencies = getattr(ex, "currencies", None) or {}
+        if compact is not None and isinstance(currencies, dict):
+            currencies = {code: compact(ccy) for code, ccy in currencies.items() if code}
+    except Exception as e:
+        error = type(e).__name__
+        currencies = None
+
+    try:
+        conn.send((currencies, error))
+    except Exception:
+        pass
+    finally:
+        conn.close()
+
+
+def _kill(proc) -> None:
+    try:
+        proc.terminate()
+        proc.join(1)
+        if proc.is_alive():
+            proc.kill()
+            proc.join(1)
+    except Exception:
+        pass
+
+
+def _mp_context(compact: Optional[Callable]):
+    try:
+        ctx = multiprocessing.get_context(MP_START)
+    except ValueError:
+        return multiprocessing.get_context("spawn")
+    if MP_START == "forkserver":
+        # ребёнок выполняет только load_markets и compact — их модули грузим в сервер один раз
+        preload = ["ccxt"]
+        module = getattr(compact, "__module__", None)
+        if module and module != "__main__":
+            preload.append(module)
+        ctx.set_forkserver_preload(preload)
+    return ctx
+
+
+def load_process(
+    eids: List[str],
+    workers: int,
+    per_exchange_seconds: float,
+    deadline: float,
+    compact: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> Iterator[LoadResult]:
+    """
+    Каждая биржа грузится в отдельном процессе (до `workers` одновременно).
+    Процесс, не уложившийся в per_exchange_seconds, убивается — зависший
+    load_markets больше не может съесть бюджет шарда.
+    Результаты отдаются по мере готовности (не в порядке eids).
+    """
+    ctx = _mp_context(compact)
+
+    timeout_ms = min(EXCHANGE_TIMEOUT_MS, int(per_exchange_seconds * 1000))
+    queue = list(eids)
+    # conn -> (eid, proc, started, ex_deadline)
+    running: Dict[Any, tuple] = {}
+
+    try:
+        while queue or running:
+            now = time.time()
+            if now > deadline:
+                break
+
+            while queue and len(running) < max(1, workers):
+                eid = queue.pop(0)
+                parent_conn, child_conn = ctx.Pipe(duplex=False)
+                proc = ctx.Process(
+                    target=_process_worker,
+                    args=(eid, child_conn, timeout_ms, compact),
+                    daemon=True,
+                )
+                proc.start()
+                child_conn.close()
+                started = time.time()
+                running[parent_conn] = (eid, proc, started, min(started + per_exchange_seconds, deadline))
+
+            next_deadline = min(v[3] for v in running.values())
+            ready = mp_wait(list(running.keys()), timeout=max(0.0, next_deadline - time.time()))
+
+            for conn in ready:
+                eid, proc, started, _ = running.pop(conn)
+                try:
+                    currencies, error = conn.recv()
+                except Exception:
+                    currencies, error = None, "worker died"
+                conn.close()
+                proc.join(1)
+                yield _result(eid, currencies, time.time() - started, error)
+
+            now = time.time()
+            for conn in [c for c, v in running.items() if now >= v[3]]:
+                eid, proc, started, _ = running.pop(conn)
+                _kill(proc)
+                conn.close()
+                # свой лимит не вышел — прервал общий deadline шарда
+                error = "deadline" if now - started >= per_exchange_seconds else BUDGET
+                yield _result(eid, None, now - started, error)
+    finally:
+        for conn, (eid, proc, started, _) in running.items():
+            _kill(proc)
+            conn.close()
+
+
+class WarmExchanges:
+    """
+    Для daemon: экземпляры бирж живут между циклами — класс ccxt создаётся один раз,
+    keep-alive соединения биржи сохраняются, повторная загрузка — load_markets(reload=True).
+    Загрузки идут в пуле потоков; одна биржа одновременно грузится не больше одного раза
+    (долгая загрузка остаётся «занятой», пока не вернётся, и заново не запускается).
+    После ошибки экземпляр выбрасывается и создаётся заново.
+    """
+
+    def __init__(self, workers: int = 16):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ccxt")
+        # RLock: add_done_callback уже завершённого future вызывает _release сразу, под этой же блокировкой
+        self._lock = threading.RLock()
+        self._instances: Dict[str, Any] = {}
+        self._busy: Dict[str, Future] = {}
+        self._late: Dict[Future, str] = {}   # не успели к deadline прошлого load()
+
+    def busy(self) -> List[str]:
+        with self._lock:
+            return list(self._busy)
+
+    def has_ready(self) -> bool:
+        """Есть результаты, догрузившиеся после deadline прошлого load()."""
+        with self._lock:
+            return any(f.done() for f in self._late)
+
+    def _instance(self, eid: str, timeout_ms: int):
+        ex = self._instances.get(eid)
+        if ex is None:
+            import ccxt
+
+            ex = getattr(ccxt, eid)({
+                "enableRateLimit": True,
+                "timeout": timeout_ms,
+            })
+            self._instances[eid] = ex
+        return ex
+
+    def _load_one(self, eid: str, per_exchange_seconds: float) -> LoadResult:
+        ex_start = time.time()
+        error = None
+        currencies = None
+        try:
+            ex = self._instance(eid, min(EXCHANGE_TIMEOUT_MS, int(per_exchange_seconds * 1000)))
+            try:
+                ex.load_markets(reload=True)
+            except Exception as e:
+                error = type(e).__name__
+            currencies = getattr(ex, "currencies", None) or {}
+        except Exception as e:
+            error = type(e).__name__
+
+        if error is not None:
+            self._instances.pop(eid, None)
+
+        seconds = time.time() - ex_start
+        if seconds > per_exchange_seconds:
+            currencies, error = None, "deadline"
+        return _result(eid, currencies, seconds, error)
+
+    def load(self, eids: List[str], per_exchange_seconds: float, deadline: float) -> Iterator[LoadResult]:
+        """
+        Результаты по мере готовности, до deadline. Не успевшие загрузки не теряются:
+        их результат отдаётся одним из следующих вызовов load().
+        """
+        futures: Dict[Future, str] = {}
+        with self._lock:
+            for fut in [f for f in self._late if f.done()]:
+                futures[fut] = self._late.pop(fut)
+            fresh = set(futures.values())
+            for eid in eids:
+                if eid in self._busy or eid in fresh:
+                    continue
+                fut = self._pool.submit(self._load_one, eid, per_exchange_seconds)
+                self._busy[eid] = fut
+                futures[fut] = eid
+                fut.add_done_callback(lambda f, eid=eid: self._release(eid, f))
+
+        pending = set(futures)
+        try:
+            while pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                done, pending = futures_wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    try:
+                        res = fut.result()
+                    except Exception as e:
+                        res = _result(futures[fut], None, 0.0, type(e).__name__)
+                    yield res
+        finally:
+            with self._lock:
+                for fut in pending:
+                    self._late[fut] = futures[fut]
+
+    def _release(self, eid: str, fut: Future) -> None:
+        with self._lock:
+            if self._busy.get(eid) is fut:
+                del self._busy[eid]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._instances.clear()
@@ -0,0 +1,166 @@
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+# Локальный индекс CoinGecko из /coins/list?include_platform=true.
+#
+# Формат data/cg_index.json.gz (компактный, json грузится C-парсером за десятки мс):
+#   {
+#     "v": 1, "built": <unix>,
+#     "ids":   ["bitcoin", ...],                 # idx -> coin id
+#     "plats": [{"ethereum": "0x.."}, {}, ...],  # idx -> platforms
+#     "sym":   {"BTC": [0, 17], ...},            # SYMBOL -> [idx]
+#     "addr":  {"0xabc..": 5, ...}               # contract (lower) -> idx
+#   }
+
+INDEX_PATH = os.getenv("CG_INDEX_PATH", "data/cg_index.json.gz")
+INDEX_MAX_AGE = float(os.getenv("CG_INDEX_MAX_AGE", str(24 * 3600)))
+REFRESH_RETRY_SECONDS = 15 * 60
+FORMAT_VERSION = 1
+
+_INDEX: Optional[Dict[str, Any]] = None
+_NEXT_REFRESH = 0.0
+_LOCK = threading.Lock()
+
+
+def build_index(coins: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ids: List[str] = []
+    plats: List[Dict[str, str]] = []
+    sym: Dict[str, List[int]] = {}
+    addr: Dict[str, int] = {}
+
+    for c in coins:
+        if not isinstance(c, dict) or not c.get("id"):
+            continue
+        i = len(ids)
+        ids.append(c["id"])
+        p = {k: v for k, v in (c.get("platforms") or {}).items() if isinstance(k, str) and k and isinstance(v, str) and v}
+        plats.append(p)
+
+        s = (c.get("symbol") or "").upper().strip()
+        if s:
+            sym.setdefault(s, []).append(i)
+        for a in p.values():
+            addr.setdefault(a.strip().lower(), i)
+
+    return {"v": FORMAT_VERSION, "built": int(time.time()), "ids": ids, "plats": plats, "sym": sym, "addr": addr}
+
+
+def save_index(index: Dict[str, Any], path: str = INDEX_PATH) -> None:
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def load_index(path: str = INDEX_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("v") != FORMAT_VERSION:
+            return None
+        return data
+    except Exception:
+        return None
+
+
+def refresh(path: str = INDEX_PATH) -> Optional[Dict[str, Any]]:
+    """Скачать свежий /coins/list и сохранить индекс. None при ошибке API."""
+    from utils.coingecko import fetch_coins_list
+
+    coins = fetch_coins_list()
+    if not coins:
+        return None
+    index = build_index(coins)
+    save_index(index, path)
+    return index
+
+
+def get_index() -> Optional[Dict[str, Any]]:
+    """
+    Индекс из памяти/с диска; раз в INDEX_MAX_AGE перестраивается из API.
+    Если обновить не вышло — работаем со старым.
+    """
+    global _INDEX, _NEXT_REFRESH
+    with _LOCK:
+        if _INDEX is None:
+            _INDEX = load_index()
+
+        stale = _INDEX is None or (time.time() - float(_INDEX.get("built", 0))) > INDEX_MAX_AGE
+        if stale and time.time() >= _NEXT_REFRESH and os.getenv("DISABLE_COINGECKO", "").lower() not in ("1", "true", "yes"):
+            fresh = refresh()
+            if fresh is not None:
+                _INDEX = fresh
+            elif _INDEX is not None:
+                # не долбить API каждый вызов — попробуем в следующий запуск
+                _INDEX["built"] = time.time()
+            else:
+                # индекса нет совсем: без паузы /coins/list запрашивался бы на каждый тикер
+                _NEXT_REFRESH = time.time() + REFRESH_RETRY_SECONDS
+        return _INDEX
+
+
+def ids_for_symbol(symbol: str) -> List[str]:
+    idx = get_index()
+    s = (symbol or "").upper().strip()
+    if not idx or not s:
+        return []
+    return [idx["ids"][i] for i in idx["sym"].get(s, [])]
+
+
+def id_for_contract(address: str) -> Optional[str]:
+    idx = get_index()
+    a = (address or "").strip().lower()
+    if not idx or not a:
+        return None
+    i = idx["addr"].get(a)
+    return idx["ids"][i] if i is not None else None
+
+
+def platforms_for_id(coin_id: str) -> Optional[Dict[str, str]]:
+    """None — id нет в индексе; {} — монета без контрактов (L1 и т.п.)."""
+    idx = get_index()
+    if not idx or not coin_id:
+        return None
+    pos = idx.get("_pos")
+    if pos is None:
+        pos = {cid: i for i, cid in enumerate(idx["ids"])}
+        idx["_pos"] = pos
+    i = pos.get(coin_id)
+    return dict(idx["plats"][i]) if i is not None else None
+
+
+def main(argv: List[str]) -> int:
+    """
+    python -m utils.cg_index build
+    python -m utils.cg_index lookup SYMBOL|CONTRACT
+    """
+    if argv[:1] == ["build"]:
+        index = refresh()
+        if index is None:
+            print("[cg_index] build failed")
+            return 1
+        print(f"[cg_index] {len(index['ids'])} coins, {len(index['addr'])} contracts -> {INDEX_PATH}")
+        return 0
+
+    if argv[:1] == ["lookup"] and len(argv) > 1:
+        q = argv[1]
+        cid = id_for_contract(q)
+        ids = [cid] if cid else ids_for_symbol(q)
+        for i in ids:
+            print(i, json.dumps(platforms_for_id(i) or {}, ensure_ascii=False))
+        return 0
+
+    print(main.__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
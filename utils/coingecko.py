@@ -1,34 +1,57 @@
 import os
-import time
-import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
 
-CG = "https://api.coingecko.com/api/v3"
+from utils.cache import DiskCache, STATIC_TTL, VOLATILE_TTL, NEGATIVE_TTL
+from utils import cg_index
+from utils.ratelimit import limiter
+from utils import httpclient
+
+CG = os.getenv("COINGECKO_API", "https://api.coingecko.com/api/v3").rstrip("/")
 
 # Cache per run
-_CACHE_ENRICH: Dict[str, Dict[str, Any]] = {}
+_CACHE_ENRICH: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}   # (ticker, contract) -> result
 _CACHE_SEARCH: Dict[str, Optional[Dict[str, Any]]] = {}
 
-def _get(url: str, params=None) -> Dict[str, Any]:
-    r = requests.get(
-        url,
-        params=params or {},
-        timeout=30,
-        headers={"User-Agent": "cex-listing-bot"},
-    )
-
-    if r.status_code == 429:
-        return {"_rate_limited": True}
-
-    if r.status_code >= 400:
-        return {"_error": f"HTTP {r.status_code}"}
-
-    return r.json()
+# Cache between runs (data/cache.db)
+_DISK_SEARCH = DiskCache("cg_search", version=1)     # ticker -> search hit | None
+_DISK_PLATFORMS = DiskCache("cg_platforms", version=1)  # coin id -> platforms
+_DISK_MARKET = DiskCache("cg_market", version=1)     # coin id -> {market_cap_usd, volume_24h_usd}
+
+def _get(url: str, params=None, max_retries: int = 2) -> Dict[str, Any]:
+    lim = limiter(url)
+    for attempt in range(max_retries + 1):
+        lim.acquire()
+        r = httpclient.get(
+            url,
+            params=params or {},
+            timeout=30,
+            headers={"User-Agent": "cex-listing-bot"},
+        )
+        retry_after = lim.feedback(r.status_code, r.headers)
+
+        if r.status_code == 429:
+            # лимитер уже притормозил; короткую паузу переждём, длинную — нет
+            if attempt < max_retries and (retry_after or 0) <= 30:
+                continue
+            return {"_rate_limited": True}
+
+        if r.status_code >= 400:
+            return {"_error": f"HTTP {r.status_code}"}
+
+        return r.json()
+
+    return {"_rate_limited": True}
+
+def fetch_coins_list() -> List[Dict[str, Any]]:
+    """/coins/list с платформами — сырьё для utils.cg_index."""
+    data = _get(f"{CG}/coins/list", {"include_platform": "true"})
+    return data if isinstance(data, list) else []
 
 def search_coin(query: str) -> Optional[Dict[str, Any]]:
     """
     Returns first CoinGecko search hit dict (includes 'id') or None.
-    Cached per run.
+    Если /search недоступен (429/ошибка) — монета из локального индекса, когда символ в нём однозначен.
+    Cached per run and on disk (misses too, with a shorter TTL).
     """
     q = (query or "").upper().strip()
     if not q:
@@ -37,16 +60,33 @@ def search_coin(query: str) -> Optional[Dict[str, Any]]:
     if q in _CACHE_SEARCH:
         return _CACHE_SEARCH[q]
 
+    hit_cached, hit = _DISK_SEARCH.get(q, STATIC_TTL, NEGATIVE_TTL)
+    if hit_cached:
+        _CACHE_SEARCH[q] = hit
+        return hit
+
     data = _get(f"{CG}/search", {"query": q})
     if data.get("_rate_limited") or data.get("_error"):
-        _CACHE_SEARCH[q] = None
-        return None
+        # Индекс бывает суточной давности, а новый листинг может занять старый символ —
+        # поэтому он только запасной путь. Ни ошибку, ни ответ индекса не кэшируем на диск.
+        candidates = cg_index.ids_for_symbol(q)
+        hit = {"id": candidates[0], "symbol": q, "provisional": True} if len(candidates) == 1 else None
+        _CACHE_SEARCH[q] = hit
+        return hit
 
     coins = data.get("coins", []) or []
     hit = coins[0] if coins else None
+    if hit:
+        hit = {k: hit.get(k) for k in ("id", "symbol", "name", "market_cap_rank")}
     _CACHE_SEARCH[q] = hit
+    _DISK_SEARCH.set(q, hit)
     return hit
 
+def is_provisional(query: str) -> bool:
+    """Символ в этом запуске найден только по локальному индексу (/search был недоступен)."""
+    hit = _CACHE_SEARCH.get((query or "").upper().strip())
+    return bool(hit and hit.get("provisional"))
+
 def coin_data(coin_id: str) -> Optional[Dict[str, Any]]:
     data = _get(
         f"{CG}/coins/{coin_id}",
@@ -63,41 +103,132 @@ def coin_data(coin_id: str) -> Optional[Dict[str, Any]]:
         return None
     return data
 
-def enrich(ticker: str) -> Dict[str, Any]:
+def coin_platforms(coin_id: str) -> Dict[str, str]:
+    """platforms монеты: локальный индекс -> дисковый кэш -> /coins/{id}."""
+    plats = cg_index.platforms_for_id(coin_id)
+    if plats is not None:
+        return plats
+
+    hit, plats = _DISK_PLATFORMS.get(coin_id, STATIC_TTL)
+    if hit:
+        return plats or {}
+
+    data = coin_data(coin_id)
+    if not data:
+        return {}
+    plats = data.get("platforms", {}) or {}
+    _DISK_PLATFORMS.set(coin_id, plats)
+    return plats
+
+def platform_contracts(ticker: str, contract: Optional[str] = None) -> Tuple[Optional[str], Dict[str, str]]:
     """
-    Best-effort enrichment. NEVER fails.
-    Returns:
-      market_cap_usd, volume_24h_usd, platform_contracts
+    (coingecko_id, platforms) без market data — для поиска контракта.
+    contract, если известен, однозначнее тикера.
     """
     if os.getenv("DISABLE_COINGECKO", "").lower() in ("1", "true", "yes"):
-        return {"market_cap_usd": None, "volume_24h_usd": None, "platform_contracts": {}}
+        return None, {}
 
-    t = (ticker or "").upper().strip()
-    if not t:
-        return {"market_cap_usd": None, "volume_24h_usd": None, "platform_contracts": {}}
+    coin_id = cg_index.id_for_contract(contract) if contract else None
+    if not coin_id:
+        hit = search_coin(ticker)
+        coin_id = hit.get("id") if hit else None
+    if not coin_id:
+        return None, {}
+    return coin_id, coin_platforms(coin_id)
 
-    if t in _CACHE_ENRICH:
-        return _CACHE_ENRICH[t]
+MARKETS_PER_PAGE = 250
 
-    out = {"market_cap_usd": None, "volume_24h_usd": None, "platform_contracts": {}}
+def fetch_markets(coin_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    id -> {market_cap_usd, volume_24h_usd} через /coins/markets, до 250 id за запрос.
+    Свежие (VOLATILE_TTL) значения берутся из дискового кэша.
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    missing: List[str] = []
+    for cid in dict.fromkeys(i for i in coin_ids if i):
+        hit, market = _DISK_MARKET.get(cid, VOLATILE_TTL)
+        if hit:
+            out[cid] = market or {"market_cap_usd": None, "volume_24h_usd": None}
+        else:
+            missing.append(cid)
+
+    for i in range(0, len(missing), MARKETS_PER_PAGE):
+        chunk = missing[i:i + MARKETS_PER_PAGE]
+        data = _get(
+            f"{CG}/coins/markets",
+            {
+                "vs_currency": "usd",
+                "ids": ",".join(chunk),
+                "per_page": MARKETS_PER_PAGE,
+                "page": 1,
+                "sparkline": "false",
+            },
+        )
+        if not isinstance(data, list):
+            # 429/ошибка — оставшиеся без market data, в кэш не пишем
+            break
+
+        got = {row.get("id"): row for row in data if isinstance(row, dict)}
+        for cid in chunk:
+            row = got.get(cid) or {}
+            m = {"market_cap_usd": row.get("market_cap"), "volume_24h_usd": row.get("total_volume")}
+            out[cid] = m
+            _DISK_MARKET.set(cid, m)
 
-    hit = search_coin(t)
-    if not hit or not hit.get("id"):
-        _CACHE_ENRICH[t] = out
-        return out
+    return out
 
-    data = coin_data(hit["id"])
-    if not data:
-        _CACHE_ENRICH[t] = out
-        return out
+def enrich_many(tickers: List[str], contracts: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Best-effort enrichment пачкой. NEVER fails.
+    contracts: ticker -> contract (если известен — id ищется по нему).
+    Returns: { TICKER: {market_cap_usd, volume_24h_usd, platform_contracts} }
+    """
+    contracts = {(k or "").upper().strip(): v for k, v in (contracts or {}).items()}
+    wanted = list(dict.fromkeys((t or "").upper().strip() for t in tickers if (t or "").strip()))
+    out = {t: {"market_cap_usd": None, "volume_24h_usd": None, "platform_contracts": {}} for t in wanted}
 
-    md = data.get("market_data", {}) or {}
-    out["market_cap_usd"] = (md.get("market_cap", {}) or {}).get("usd")
-    out["volume_24h_usd"] = (md.get("total_volume", {}) or {}).get("usd")
-    out["platform_contracts"] = data.get("platforms", {}) or {}
+    if os.getenv("DISABLE_COINGECKO", "").lower() in ("1", "true", "yes"):
+        return out
 
-    # be polite to avoid 429 on shared runners
-    time.sleep(0.7)
+    # id монеты зависит и от контракта, поэтому и ключ кэша — (тикер, контракт)
+    key = lambda t: (t, contracts.get(t) or None)
+    ids: Dict[str, str] = {}
+    for t in wanted:
+        if key(t) in _CACHE_ENRICH:
+            out[t] = _CACHE_ENRICH[key(t)]
+            continue
+        try:
+            coin_id, plats = platform_contracts(t, contracts.get(t))
+        except Exception:
+            coin_id, plats = None, {}
+        if coin_id:
+            ids[t] = coin_id
+            out[t]["platform_contracts"] = plats or {}
+        else:
+            _CACHE_ENRICH[key(t)] = out[t]
+
+    try:
+        markets = fetch_markets(list(ids.values()))
+    except Exception:
+        markets = {}
+
+    for t, coin_id in ids.items():
+        m = markets.get(coin_id)
+        if m is None:
+            continue
+        out[t].update(m)
+        _CACHE_ENRICH[key(t)] = out[t]
 
-    _CACHE_ENRICH[t] = out
     return out
+
+def enrich(ticker: str, contract: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Best-effort enrichment. NEVER fails.
+    Returns:
+      market_cap_usd, volume_24h_usd, platform_contracts
+    """
+    t = (ticker or "").upper().strip()
+    if not t:
+        return {"market_cap_usd": None, "volume_24h_usd": None, "platform_contracts": {}}
+    res = enrich_many([t], {t: contract} if contract else None)
+    return res.get(t) or {"market_cap_usd": None, "volume_24h_usd": None, "platform_contracts": {}}
@@ -0,0 +1,119 @@
+import re
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+# Текст детальной страницы анонса.
+#
+# Вместо get_text() по всему документу (nav/футер/скрипты + обрезка до 20000 символов)
+# страница читается потоком (HTMLPullParser). content_selector биржи — список по приоритету:
+# как только закрылся элемент первого селектора, дальше ответ не дочитывается; иначе
+# документ дочитывается и берётся элемент лучшего из сработавших селекторов.
+# Если ни один селектор не сработал — текст всего документа без script/style/nav/footer.
+#
+# Селекторы — простые: tag, #id, .class, tag#id.class (можно списком, по приоритету).
+
+DEFAULT_SELECTORS = ["article", "main"]
+MAX_TEXT = 200000
+CHUNK = 16384
+
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "footer", "header"}
+_SEL_RE = re.compile(r"^([a-zA-Z][a-zA-Z0-9]*)?(#[\w-]+)?((?:\.[\w-]+)*)$")
+
+Selector = Tuple[Optional[str], Optional[str], Tuple[str, ...]]
+
+
+def parse_selectors(sel: Any) -> List[Selector]:
+    raw = sel if isinstance(sel, list) else ([sel] if sel else DEFAULT_SELECTORS)
+    out = []
+    for s in raw:
+        m = _SEL_RE.match((s or "").strip())
+        if not m or not any(m.groups()):
+            continue
+        tag = m.group(1).lower() if m.group(1) else None
+        el_id = m.group(2)[1:] if m.group(2) else None
+        classes = tuple(c for c in (m.group(3) or "").split(".") if c)
+        out.append((tag, el_id, classes))
+    return out
+
+
+def _matches(el, sel: Selector) -> bool:
+    tag, el_id, classes = sel
+    if not isinstance(el.tag, str):
+        return False
+    if tag and el.tag.lower() != tag:
+        return False
+    if el_id and el.get("id") != el_id:
+        return False
+    if classes:
+        have = set((el.get("class") or "").split())
+        if not all(c in have for c in classes):
+            return False
+    return True
+
+
+def _text_of(el) -> str:
+    parts = []
+
+    def walk(node):
+        if isinstance(node.tag, str) and node.tag.lower() in _SKIP_TAGS:
+            if node.tail and node.tail.strip():
+                parts.append(node.tail.strip())
+            return
+        if node.text and node.text.strip():
+            parts.append(node.text.strip())
+        for ch in node:
+            walk(ch)
+        if node is not el and node.tail and node.tail.strip():
+            parts.append(node.tail.strip())
+
+    walk(el)
+    return "\n".join(parts)[:MAX_TEXT]
+
+
+def extract_stream(chunks: Iterable[bytes], selectors: List[Selector], encoding: Optional[str] = None) -> str:
+    """
+    Кормит парсер кусками. Селекторы — по приоритету: на закрытии элемента первого
+    селектора разбор останавливается; иначе в конце документа берётся элемент
+    лучшего из сработавших селекторов (для каждого — первый в документе).
+    chunks можно не дочитывать — вызывающий закроет ответ.
+    """
+    import lxml.etree  # только когда нужен: bot импортирует модуль и в запусках без html
+
+    parser = lxml.etree.HTMLPullParser(events=("start", "end"), encoding=encoding, recover=True)
+    # индекс селектора -> первый подходящий элемент
+    found: Dict[int, Any] = {}
+
+    def scan() -> bool:
+        for event, el in parser.read_events():
+            if event == "start":
+                for i, s in enumerate(selectors):
+                    if i in found:
+                        continue
+                    if _matches(el, s):
+                        found[i] = el
+                        break
+            elif event == "end" and found.get(0) is el:
+                return True
+        return False
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parser.feed(chunk)
+        if scan():
+            return _text_of(found[0])
+
+    try:
+        root = parser.close()
+    except Exception:
+        return ""
+    scan()
+    if found:
+        return _text_of(found[min(found)])
+    return _text_of(root) if root is not None else ""
+
+
+def extract_text(html: str, cfg: Optional[Dict[str, Any]] = None) -> str:
+    """То же, но для уже скачанного html."""
+    data = html.encode("utf-8") if isinstance(html, str) else html
+    sels = parse_selectors((cfg or {}).get("content_selector"))
+    return extract_stream((data[i:i + CHUNK] for i in range(0, len(data), CHUNK)), sels, encoding="utf-8")
@@ -1,24 +1,42 @@
-import requests
+import os
 from typing import Optional, Dict, Any
 
-BASE = "https://api.dexscreener.com/latest/dex"
+from utils.cache import DiskCache, STATIC_TTL, NEGATIVE_TTL
+from utils.ratelimit import limiter
+from utils import httpclient
+
+BASE = os.getenv("DEXSCREENER_API", "https://api.dexscreener.com/latest/dex").rstrip("/")
+
+# query -> первая пара | None (между запусками)
+_DISK_SEARCH = DiskCache("dex_search", version=1)
 
 def search(token: str) -> Optional[Dict[str, Any]]:
     q = (token or "").strip()
     if not q:
         return None
 
-    r = requests.get(
+    hit, pair = _DISK_SEARCH.get(q.upper(), STATIC_TTL, NEGATIVE_TTL)
+    if hit:
+        return pair
+
+    lim = limiter(BASE)
+    lim.acquire()
+    r = httpclient.get(
         f"{BASE}/search",
         params={"q": q},
         timeout=30,
         headers={"User-Agent": "cex-listing-bot"},
     )
+    lim.feedback(r.status_code, r.headers)
     if r.status_code >= 400:
         return None
     data = r.json() or {}
     pairs = data.get("pairs") or []
-    return pairs[0] if pairs else None
+    pair = pairs[0] if pairs else None
+    if pair:
+        pair = {k: pair.get(k) for k in ("chainId", "dexId", "url", "pairAddress", "baseToken")}
+    _DISK_SEARCH.set(q.upper(), pair)
+    return pair
 
 def extract_contract_from_pair(pair: Dict[str, Any]) -> Optional[str]:
     if not pair:
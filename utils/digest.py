@@ -0,0 +1,116 @@
+import os
+import threading
+from typing import Dict, Any, List, Callable, Optional
+
+# Склейка пачки алертов в digest-сообщения.
+#
+# Когда одна биржа за запуск выдаёт больше DIGEST_THRESHOLD алертов (биржа впервые
+# попала в шард, переименовала коды, пачка анонсов), вместо сообщения на каждый код
+# уходит один digest (или несколько частей, если не влезает в лимит Telegram 4096 символов).
+#
+#   Coalescer      — потокобезопасный буфер: group (биржа) -> записи
+#   pack_messages  — заголовок + строки -> сообщения не длиннее лимита, с "(i/n)"
+#   mdv2_escape / html_escape — экранирование под parse_mode
+
+DIGEST_THRESHOLD = int(os.getenv("DIGEST_THRESHOLD", "3"))
+TG_LIMIT = 4096
+
+_MDV2_SPECIAL = "\\_*[]()~`>#+-=|{}.!"
+
+
+def mdv2_escape(s: Any) -> str:
+    s = "" if s is None else str(s)
+    return "".join("\\" + ch if ch in _MDV2_SPECIAL else ch for ch in s)
+
+
+def mdv2_code(s: Any) -> str:
+    # внутри `...` экранируются только ` и \
+    s = "" if s is None else str(s)
+    return "`" + s.replace("\\", "\\\\").replace("`", "\\`") + "`"
+
+
+def html_escape(s: Any) -> str:
+    if s is None:
+        return ""
+    return str(s).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def _part_suffix(i: int, n: int, parse_mode: str) -> str:
+    if n <= 1:
+        return ""
+    return f" \\({i}/{n}\\)" if parse_mode == "MarkdownV2" else f" ({i}/{n})"
+
+
+def tg_len(s: str) -> int:
+    # Telegram считает длину в UTF-16 code units (эмодзи — 2)
+    return len(s.encode("utf-16-le")) // 2
+
+
+def pack_messages(header: str, lines: List[str], parse_mode: str, limit: int = TG_LIMIT) -> List[str]:
+    """
+    header и lines уже экранированы. Строки не режутся: сообщение заканчивается
+    на границе строки; одиночная строка длиннее лимита отбрасывается.
+    """
+    reserve = 16  # под " (12/34)"
+    budget = limit - tg_len(header) - reserve - 1
+    chunks: List[List[str]] = [[]]
+    size = 0
+    for line in lines:
+        n = tg_len(line) + 1
+        if n > budget:
+            continue
+        if chunks[-1] and size + n > budget:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(line)
+        size += n
+
+    n = len(chunks)
+    return [
+        header + _part_suffix(i, n, parse_mode) + "\n" + "\n".join(chunk)
+        for i, chunk in enumerate(chunks, 1)
+        if chunk
+    ]
+
+
+class Coalescer:
+    """
+    Буфер алертов по группам. add() -> True, если запись забрана в digest
+    (группа помечена как burst); иначе вызывающий отправляет её сам.
+    """
+
+    def __init__(self, threshold: int = DIGEST_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._burst: Dict[str, bool] = {}
+        self._items: Dict[str, List[Dict[str, Any]]] = {}
+
+    def mark(self, group: str, expected: int) -> bool:
+        """Сколько алертов ожидается от группы; больше порога — всё идёт в digest."""
+        with self._lock:
+            burst = expected > self.threshold
+            if burst:
+                self._burst[group] = True
+            return burst
+
+    def add(self, group: str, item: Dict[str, Any]) -> bool:
+        with self._lock:
+            if not self._burst.get(group):
+                return False
+            self._items.setdefault(group, []).append(item)
+            return True
+
+    def flush(self, send: Callable[[str, List[Dict[str, Any]]], Any]) -> int:
+        """send(group, items) для каждой накопленной группы; возвращает число групп."""
+        with self._lock:
+            groups, self._items = self._items, {}
+        for group, items in groups.items():
+            if items:
+                send(group, items)
+        return len(groups)
+
+    def pending(self, group: Optional[str] = None) -> int:
+        with self._lock:
+            if group is not None:
+                return len(self._items.get(group, []))
+            return sum(len(v) for v in self._items.values())
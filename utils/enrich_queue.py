@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+
+# Детект и обогащение разведены:
+#   submit(ticker, record)     — детектор кладёт запись и сразу идёт дальше
+#   resolve_batch(tickers)     — обогащение пачкой (CoinGecko/DexScreener), в пуле потоков
+#   deliver(record, result)    — отправка алерта; result=None, если обогащение не успело к дедлайну
+# Один тикер резолвится один раз, даже если он появился на нескольких биржах.
+
+_STOP = object()
+
+
+class EnrichmentPipeline:
+    def __init__(
+        self,
+        resolve_batch: Callable[[List[str]], Dict[str, Any]],
+        deliver: Callable[[Dict[str, Any], Optional[Any]], None],
+        workers: int = 4,
+        batch_size: int = 10,
+        batch_wait: float = 0.5,
+        max_seconds: float = 45.0,
+    ):
+        self._resolve_batch = resolve_batch
+        self._deliver = deliver
+        self._batch_size = max(1, batch_size)
+        self._batch_wait = batch_wait
+        self._max_seconds = max_seconds
+
+        self._q: "queue.Queue" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="enrich")
+        self._lock = threading.Lock()          # _waiting / _results / _inflight
+        self._deliver_lock = threading.Lock()  # отправка строго по одной
+
+        self._waiting: Dict[str, List[Dict[str, Any]]] = {}   # ticker -> records
+        self._results: Dict[str, Any] = {}
+        self._inflight = 0
+        self._closed = False
+
+        self._dispatcher = threading.Thread(target=self._run, name="enrich-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    # ---- public ----
+
+    def submit(self, ticker: str, record: Dict[str, Any]) -> None:
+        t = (ticker or "").upper().strip()
+        record = dict(record)
+        record["_deadline"] = time.time() + self._max_seconds
+        self._q.put((t, record))
+
+    def close(self, deadline: float) -> None:
+        """
+        Ждём, пока всё обогатится и отправится, но не дольше deadline.
+        Что не успело — уходит без обогащения.
+        """
+        self._q.put(_STOP)
+        self._dispatcher.join(max(0.0, deadline - time.time()))
+
+        while time.time() < deadline:
+            self._expire()
+            with self._lock:
+                busy = bool(self._waiting)
+            if not busy:
+                break
+            time.sleep(0.05)
+
+        with self._lock:
+            self._closed = True
+            left = [r for recs in self._waiting.values() for r in recs]
+            self._waiting.clear()
+
+        for r in left:
+            self._safe_deliver(r, None)
+
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---- internals ----
+
+    def _safe_deliver(self, record: Dict[str, Any], result: Optional[Any]) -> None:
+        record = {k: v for k, v in record.items() if k != "_deadline"}
+        with self._deliver_lock:
+            try:
+                self._deliver(record, result)
+            except Exception:
+                pass
+
+    def _run(self) -> None:
+        batch: List[str] = []
+        batch_started = 0.0
+        stopping = False
+
+        while True:
+            timeout = self._batch_wait if not batch else max(0.0, batch_started + self._batch_wait - time.time())
+            try:
+                item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                ticker, record = item
+                new_ticker = self._add(ticker, record)
+                if new_ticker:
+                    if not batch:
+                        batch_started = time.time()
+                    batch.append(ticker)
+
+            if batch and (stopping or len(batch) >= self._batch_size or time.time() - batch_started >= self._batch_wait):
+                self._dispatch(batch)
+                batch = []
+
+            self._expire()
+
+            if stopping and self._q.empty():
+                return
+
+    def _add(self, ticker: str, record: Dict[str, Any]) -> bool:
+        """True — тикер новый, его нужно отправить на обогащение."""
+        with self._lock:
+            if ticker in self._results:
+                result = self._results[ticker]
+            else:
+                is_new = ticker not in self._waiting
+                self._waiting.setdefault(ticker, []).append(record)
+                return is_new
+        self._safe_deliver(record, result)
+        return False
+
+    def _dispatch(self, tickers: List[str]) -> None:
+        with self._lock:
+            self._inflight += 1
+        try:
+            self._pool.submit(self._work, list(tickers))
+        except RuntimeError:
+            with self._lock:
+                self._inflight -= 1
+
+    def _work(self, tickers: List[str]) -> None:
+        try:
+            try:
+                results = self._resolve_batch(tickers) or {}
+            except Exception:
+                results = {}
+
+            for t in tickers:
+                res = results.get(t)
+                with self._lock:
+                    if self._closed:
+                        return
+                    self._results[t] = res
+                    recs = self._waiting.pop(t, [])
+                for r in recs:
+                    self._safe_deliver(r, res)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def _expire(self) -> None:
+        now = time.time()
+        expired = []
+        with self._lock:
+            for t, recs in list(self._waiting.items()):
+                keep = [r for r in recs if r["_deadline"] > now]
+                expired += [r for r in recs if r["_deadline"] <= now]
+                if keep:
+                    self._waiting[t] = keep
+                else:
+                    # тикер остаётся в работе; запоздавший результат просто никому не нужен
+                    self._waiting.pop(t)
+        for r in expired:
+            self._safe_deliver(r, None)
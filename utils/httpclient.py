@@ -0,0 +1,117 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Callable, Optional, TypeVar, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics
+
+# Общий HTTP-слой: по одной requests.Session на host (keep-alive, пул соединений),
+# плюс параллельный fetch с ограничением на host.
+# Каждый запрос пишет метрики по host: http_request_seconds (до заголовков ответа,
+# для stream=True тело не входит), http_requests{status}, http_errors{error}.
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0 (cex-listing-bot)"}
+DEFAULT_TIMEOUT = 30
+
+PER_HOST = int(os.getenv("HTTP_PER_HOST", "4"))
+MAX_WORKERS = int(os.getenv("HTTP_MAX_WORKERS", "16"))
+
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+_HOST_SEMS: Dict[str, threading.BoundedSemaphore] = {}
+
+T = TypeVar("T")
+X = TypeVar("X")
+
+
+def host_of(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+def session_for(url: str) -> requests.Session:
+    host = host_of(url)
+    with _SESSIONS_LOCK:
+        s = _SESSIONS.get(host)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(PER_HOST, MAX_WORKERS), max_retries=0)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers.update(DEFAULT_HEADERS)
+            _SESSIONS[host] = s
+        return s
+
+
+def _request(method: str, url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    host = host_of(url)
+    try:
+        with metrics.timer("http_request_seconds", host=host):
+            r = session_for(url).request(method, url, **kwargs)
+    except Exception as e:
+        metrics.inc("http_errors", host=host, error=type(e).__name__)
+        raise
+    metrics.inc("http_requests", host=host, status=r.status_code)
+    return r
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return _request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return _request("POST", url, **kwargs)
+
+
+def _host_sem(host: str) -> threading.BoundedSemaphore:
+    with _SESSIONS_LOCK:
+        sem = _HOST_SEMS.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(max(1, PER_HOST))
+            _HOST_SEMS[host] = sem
+        return sem
+
+
+def fetch_all(
+    items: List[X],
+    fetch: Callable[[X], T],
+    url_of: Optional[Callable[[X], str]] = None,
+    max_workers: int = MAX_WORKERS,
+) -> List[Union[T, Exception]]:
+    """
+    fetch(item) для всех items параллельно: не больше max_workers всего
+    и не больше HTTP_PER_HOST одновременно на один host (host — по url_of(item),
+    по умолчанию item сам является URL). Результаты — в порядке items;
+    исключение fetch возвращается как значение, а не пробрасывается.
+    """
+    if not items:
+        return []
+    url_of = url_of or (lambda x: x)  # type: ignore[assignment,return-value]
+
+    def run(item: X):
+        with _host_sem(host_of(url_of(item))):
+            try:
+                return fetch(item)
+            except Exception as e:
+                return e
+
+    if len(items) == 1:
+        return [run(items[0])]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix="http") as pool:
+        return list(pool.map(run, items))
+
+
+def close_all() -> None:
+    with _SESSIONS_LOCK:
+        for s in _SESSIONS.values():
+            try:
+                s.close()
+            except Exception:
+                pass
+        _SESSIONS.clear()
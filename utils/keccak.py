@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+# Keccak-256 (как в Ethereum, НЕ hashlib.sha3_256 — у того другой padding).
+# Чистый Python: нужен только для EIP-55 checksum, адресов в анонсе единицы.
+
+_RC = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+# _ROT[x][y]
+_ROT = [
+    [0, 36, 3, 41, 18],
+    [1, 44, 10, 45, 2],
+    [62, 6, 43, 15, 61],
+    [28, 55, 25, 21, 56],
+    [27, 20, 39, 8, 14],
+]
+_MASK = (1 << 64) - 1
+_RATE = 136  # байт, для 256-битного выхода
+
+
+def _rotl(v: int, n: int) -> int:
+    return ((v << n) | (v >> (64 - n))) & _MASK if n else v
+
+
+def _keccak_f(a):
+    for rc in _RC:
+        c = [a[x][0] ^ a[x][1] ^ a[x][2] ^ a[x][3] ^ a[x][4] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rotl(c[(x + 1) % 5], 1) for x in range(5)]
+        a = [[a[x][y] ^ d[x] for y in range(5)] for x in range(5)]
+
+        b = [[0] * 5 for _ in range(5)]
+        for x in range(5):
+            for y in range(5):
+                b[y][(2 * x + 3 * y) % 5] = _rotl(a[x][y], _ROT[x][y])
+
+        a = [[b[x][y] ^ ((~b[(x + 1) % 5][y]) & b[(x + 2) % 5][y]) for y in range(5)] for x in range(5)]
+        a[0][0] ^= rc
+    return a
+
+
+def keccak256(data: bytes) -> bytes:
+    msg = bytearray(data)
+    msg.append(0x01)
+    while len(msg) % _RATE:
+        msg.append(0)
+    msg[-1] |= 0x80
+
+    a = [[0] * 5 for _ in range(5)]
+    for off in range(0, len(msg), _RATE):
+        block = msg[off:off + _RATE]
+        for i in range(_RATE // 8):
+            a[i % 5][i // 5] ^= int.from_bytes(block[i * 8:i * 8 + 8], "little")
+        a = _keccak_f(a)
+
+    out = b"".join(a[i % 5][i // 5].to_bytes(8, "little") for i in range(4))
+    return out
+
+
+@lru_cache(maxsize=4096)
+def to_checksum_address(addr: str) -> str:
+    """EIP-55: регистр hex-символа = старший бит соответствующего nibble keccak(lowercase)."""
+    hexpart = addr[2:].lower()
+    h = keccak256(hexpart.encode("ascii")).hex()
+    return "0x" + "".join(ch.upper() if int(h[i], 16) >= 8 else ch for i, ch in enumerate(hexpart))
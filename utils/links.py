@@ -0,0 +1,137 @@
+import re
+from typing import Dict, Any, List, Optional, Pattern
+from urllib.parse import urljoin
+
+# Извлечение ссылок на анонсы со страницы листингов.
+#
+# extract_links       — быстрый путь: lxml + XPath (фильтр link_contains прямо в XPath,
+#                       до извлечения текста), ключевые слова — один прекомпилированный regex.
+# extract_links_soup  — прежняя реализация на полном BeautifulSoup-дереве (эталон для бенчмарка).
+#
+# Конфиг биржи (exchanges.yaml): link_contains, keywords_any, опционально link_xpath.
+# lxml импортируется при первом разборе: модуль подтягивается реестром источников
+# и в запусках только по ccxt (SCAN_MODE=ccxt), где парсер не нужен.
+
+MAX_LINKS = 40
+
+_MATCHERS: Dict[tuple, Optional[Pattern]] = {}
+_XPATHS: Dict[tuple, Any] = {}
+
+
+def keyword_matcher(keywords: List[str]) -> Optional[Pattern]:
+    """Один regex на все ключевые слова биржи, компилируется один раз."""
+    key = tuple(keywords or ())
+    if key not in _MATCHERS:
+        kws = [k for k in key if k]
+        _MATCHERS[key] = re.compile("|".join(re.escape(k) for k in kws), re.IGNORECASE) if kws else None
+    return _MATCHERS[key]
+
+
+def _xpath(cfg: Dict[str, Any]):
+    key = (cfg.get("link_xpath"), cfg.get("link_contains"))
+    xp = _XPATHS.get(key)
+    if xp is None:
+        import lxml.etree
+
+        if cfg.get("link_xpath"):
+            xp = lxml.etree.XPath(cfg["link_xpath"])
+        elif cfg.get("link_contains"):
+            xp = lxml.etree.XPath("//a[@href and contains(@href, $needle)]")
+        else:
+            xp = lxml.etree.XPath("//a[@href]")
+        _XPATHS[key] = xp
+    return xp
+
+
+_TEXT_XPATH = ".//text()[not(ancestor::script or ancestor::style or ancestor::noscript)]"
+
+
+def _anchor_text(a) -> str:
+    # то же, что BeautifulSoup get_text(" ", strip=True); текст script/style/noscript
+    # внутри <a> не виден пользователю и не должен давать совпадение по ключевым словам
+    return " ".join(t.strip() for t in a.xpath(_TEXT_XPATH) if t and t.strip())
+
+
+def extract_links(html: str, cfg: Dict[str, Any]) -> List[Dict[str, str]]:
+    if not html:
+        return []
+    import lxml.html
+
+    try:
+        doc = lxml.html.fromstring(html)
+    except Exception:
+        return []
+
+    base = cfg["url"]
+    needle = cfg.get("link_contains")
+    kw_re = keyword_matcher(cfg.get("keywords_any", []))
+    xp = _xpath(cfg)
+
+    anchors = xp(doc, needle=needle) if (needle and not cfg.get("link_xpath")) else xp(doc)
+
+    out = []
+    seen_urls = set()
+    for a in anchors:
+        href = a.get("href")
+        if not href:
+            continue
+        if needle and needle not in href:
+            continue
+
+        text = _anchor_text(a)
+        if not text:
+            continue
+        if kw_re is not None and not kw_re.search(text):
+            continue
+
+        if href.startswith("/"):
+            href = urljoin(base, href)
+        if href in seen_urls:
+            continue
+        seen_urls.add(href)
+
+        out.append({"title": text, "url": href})
+        if len(out) >= MAX_LINKS:
+            break
+
+    return out
+
+
+def extract_links_soup(html: str, cfg: Dict[str, Any]) -> List[Dict[str, str]]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml")
+    # script/style get_text и так пропускает, noscript — нет
+    for t in soup.find_all("noscript"):
+        t.decompose()
+
+    items = []
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        text = a.get_text(" ", strip=True)
+
+        if cfg.get("link_contains") and (cfg["link_contains"] not in href):
+            continue
+
+        if href.startswith("/"):
+            href = urljoin(cfg["url"], href)
+
+        if not text:
+            continue
+
+        low = text.lower()
+        kws = [k.lower() for k in cfg.get("keywords_any", [])]
+        if kws and not any(k in low for k in kws):
+            continue
+
+        items.append({"title": text, "url": href})
+
+    seen_urls = set()
+    out = []
+    for it in items:
+        if it["url"] in seen_urls:
+            continue
+        seen_urls.add(it["url"])
+        out.append(it)
+
+    return out[:MAX_LINKS]
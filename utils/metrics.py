@@ -0,0 +1,192 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+# Лёгкие метрики одного запуска: счётчики, gauge, гистограммы, таймеры.
+#
+#   inc("http_requests", host="api.coingecko.com", status=200)
+#   observe("alert_latency_seconds", 3.2, source="ccxt")
+#   with timer("html_scan_seconds", source="Binance"): ...
+#
+# В конце запуска write() пишет JSON (METRICS_PATH) и, если задан METRICS_PROM,
+# Prometheus textfile (для node_exporter textfile collector). В JSON попадает
+# и статистика лимитеров (utils.ratelimit.stats()).
+
+METRICS_PATH = os.getenv("METRICS_PATH", "data/metrics.json")
+METRICS_PROM = os.getenv("METRICS_PROM", "")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+MAX_SAMPLES = 2048
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_LOCK = threading.Lock()
+_COUNTERS: Dict[Key, float] = {}
+_GAUGES: Dict[Key, float] = {}
+_HISTS: Dict[Key, Dict[str, Any]] = {}
+_STARTED = time.time()
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def inc(name: str, n: float = 1, **labels) -> None:
+    k = _key(name, labels)
+    with _LOCK:
+        _COUNTERS[k] = _COUNTERS.get(k, 0) + n
+
+
+def gauge(name: str, value: float, **labels) -> None:
+    with _LOCK:
+        _GAUGES[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    k = _key(name, labels)
+    with _LOCK:
+        h = _HISTS.get(k)
+        if h is None:
+            h = {"count": 0, "sum": 0.0, "min": value, "max": value, "buckets": [0] * len(BUCKETS), "samples": []}
+            _HISTS[k] = h
+        h["count"] += 1
+        h["sum"] += value
+        h["min"] = min(h["min"], value)
+        h["max"] = max(h["max"], value)
+        for i, b in enumerate(BUCKETS):
+            if value <= b:
+                h["buckets"][i] += 1
+                break
+        # reservoir — квантили для JSON без хранения всех значений
+        if len(h["samples"]) < MAX_SAMPLES:
+            h["samples"].append(value)
+        else:
+            j = random.randrange(h["count"])
+            if j < MAX_SAMPLES:
+                h["samples"][j] = value
+
+
+@contextmanager
+def timer(name: str, **labels):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t, **labels)
+
+
+def reset() -> None:
+    global _STARTED
+    with _LOCK:
+        _COUNTERS.clear()
+        _GAUGES.clear()
+        _HISTS.clear()
+        _STARTED = time.time()
+
+
+def _quantile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * (len(s) - 1) + 0.5))]
+
+
+def _label_str(labels: Tuple[Tuple[str, str], ...]) -> str:
+    return ",".join(f"{k}={v}" for k, v in labels)
+
+
+def snapshot() -> Dict[str, Any]:
+    from utils.ratelimit import stats as ratelimit_stats
+
+    with _LOCK:
+        counters = {f"{n}{{{_label_str(l)}}}" if l else n: v for (n, l), v in _COUNTERS.items()}
+        gauges = {f"{n}{{{_label_str(l)}}}" if l else n: v for (n, l), v in _GAUGES.items()}
+        hists = {}
+        for (n, l), h in _HISTS.items():
+            hists[f"{n}{{{_label_str(l)}}}" if l else n] = {
+                "count": h["count"],
+                "sum": round(h["sum"], 6),
+                "min": round(h["min"], 6),
+                "max": round(h["max"], 6),
+                "p50": _quantile(h["samples"], 0.5),
+                "p95": _quantile(h["samples"], 0.95),
+            }
+
+    return {
+        "started": _STARTED,
+        "seconds": round(time.time() - _STARTED, 3),
+        "counters": dict(sorted(counters.items())),
+        "gauges": dict(sorted(gauges.items())),
+        "histograms": dict(sorted(hists.items())),
+        "ratelimit": ratelimit_stats(),
+    }
+
+
+def _prom_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def prometheus_text(prefix: str = "cexbot_") -> str:
+    lines: List[str] = []
+    typed = set()
+
+    def family(name: str, kind: str) -> None:
+        # "# TYPE" — один раз на семейство, перед первым сэмплом
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    with _LOCK:
+        for (n, l), v in sorted(_COUNTERS.items()):
+            family(f"{prefix}{n}_total", "counter")
+            lines.append(f"{prefix}{n}_total{_prom_labels(l)} {v}")
+        for (n, l), v in sorted(_GAUGES.items()):
+            family(f"{prefix}{n}", "gauge")
+            lines.append(f"{prefix}{n}{_prom_labels(l)} {v}")
+        for (n, l), h in sorted(_HISTS.items()):
+            family(f"{prefix}{n}", "histogram")
+            cum = 0
+            for b, c in zip(BUCKETS, h["buckets"]):
+                cum += c
+                lines.append(f"{prefix}{n}_bucket{_prom_labels(l, (('le', str(b)),))} {cum}")
+            lines.append(f"{prefix}{n}_bucket{_prom_labels(l, (('le', '+Inf'),))} {h['count']}")
+            lines.append(f"{prefix}{n}_sum{_prom_labels(l)} {h['sum']}")
+            lines.append(f"{prefix}{n}_count{_prom_labels(l)} {h['count']}")
+    from utils.ratelimit import stats as ratelimit_stats
+
+    rl = sorted(ratelimit_stats().items())
+    for k in ("requests", "waits", "wait_seconds", "throttles"):
+        for host, st in rl:
+            family(f"{prefix}ratelimit_{k}", "counter")
+            lines.append(f"{prefix}ratelimit_{k}{_prom_labels((('host', host),))} {st[k]}")
+    family(f"{prefix}run_seconds", "gauge")
+    lines.append(f"{prefix}run_seconds {round(time.time() - _STARTED, 3)}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write(path: Optional[str] = None, prom_path: Optional[str] = None) -> None:
+    """JSON всегда, Prometheus textfile — если задан путь. Ошибки записи не роняют запуск."""
+    path = path or METRICS_PATH
+    prom_path = prom_path if prom_path is not None else METRICS_PROM
+    try:
+        _write_atomic(path, json.dumps(snapshot(), ensure_ascii=False, indent=1))
+        if prom_path:
+            _write_atomic(prom_path, prometheus_text())
+    except Exception:
+        pass
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from utils.tg import send_to_chats, _parse_chat_ids
+
+# Общий outbox для всех алертов (CCXT и html-анонсы).
+#
+# Сообщение сначала записывается в журнал (JSONL, только дописывание), потом отправляется;
+# доставка отмечается по каждому чату отдельно, поэтому повтор уходит только в те чаты,
+# куда не дошло. Записи журнала:
+#   {"op": "add",  "id", "text", "parse_mode", "preview", "chats": [...], "ts"}
+#   {"op": "sent", "id", "chat"}
+#   {"op": "fail", "id"}               — неудачная попытка (считается до MAX_ATTEMPTS)
+#   {"op": "done", "id"}               — доставлено во все чаты или выброшено
+# Журнал периодически сжимается: остаются недоставленные сообщения и последние DONE_KEEP id
+# (чтобы повторный enqueue того же алерта не отправил его второй раз).
+#
+# OUTBOX_PATH — свой файл на шард (см. workflow: между запусками лежит в actions/cache,
+# в репозиторий не коммитится), OUTBOX_DRAIN_MAX — сколько старых сообщений досылать за запуск.
+
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "data/outbox.jsonl")
+LEGACY_PENDING_HTML = "data/pending_html.json"
+
+DRAIN_MAX = int(os.getenv("OUTBOX_DRAIN_MAX", "20"))
+MAX_ATTEMPTS = 12
+# попыток внутри одного send(): остальное досылается следующими запусками, а не ожиданием
+SEND_RETRIES = 2
+MAX_AGE_SECONDS = 3 * 24 * 3600
+DONE_KEEP = 1000
+COMPACT_MIN_LINES = 200
+
+
+def message_id(text: str, parse_mode: str) -> str:
+    base = f"{parse_mode}||{text}".encode("utf-8")
+    return hashlib.sha256(base).hexdigest()[:24]
+
+
+class Outbox:
+    def __init__(self, path: str = OUTBOX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._items: Dict[str, Dict[str, Any]] = {}   # id -> {text, parse_mode, preview, chats{chat: bool}, attempts, ts}
+        self._done: Dict[str, None] = {}              # упорядоченное множество
+        self._lines = 0
+        self._load()
+        self._migrate_legacy()
+
+    # --- журнал ---
+
+    def _apply(self, ev: Dict[str, Any]) -> None:
+        op = ev.get("op")
+        mid = ev.get("id")
+        if not mid:
+            return
+        if op == "add":
+            if mid in self._items or mid in self._done:
+                return
+            self._items[mid] = {
+                "text": ev.get("text") or "",
+                "parse_mode": ev.get("parse_mode") or "HTML",
+                "preview": bool(ev.get("preview", False)),
+                "chats": {str(c): False for c in ev.get("chats") or []},
+                "attempts": int(ev.get("attempts") or 0),
+                "ts": float(ev.get("ts") or 0),
+            }
+        elif op == "sent":
+            it = self._items.get(mid)
+            if it is not None and str(ev.get("chat")) in it["chats"]:
+                it["chats"][str(ev["chat"])] = True
+        elif op == "fail":
+            it = self._items.get(mid)
+            if it is not None:
+                it["attempts"] += 1
+        elif op == "done":
+            self._items.pop(mid, None)
+            self._done.pop(mid, None)
+            self._done[mid] = None
+            while len(self._done) > DONE_KEEP:
+                self._done.pop(next(iter(self._done)))
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    self._lines += 1
+                    try:
+                        ev = json.loads(line)
+                    except ValueError:
+                        continue  # недописанная строка после падения
+                    if isinstance(ev, dict):
+                        self._apply(ev)
+        except FileNotFoundError:
+            pass
+
+    def _append(self, events: List[Dict[str, Any]]) -> None:
+        for ev in events:
+            self._apply(ev)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for ev in events:
+                f.write(json.dumps(ev, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._lines += len(events)
+
+    def _migrate_legacy(self) -> None:
+        """data/pending_html.json (прежний список недосланных html-алертов) -> outbox."""
+        if not os.path.exists(LEGACY_PENDING_HTML):
+            return
+        try:
+            with open(LEGACY_PENDING_HTML, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except Exception:
+            items = []
+        for x in items if isinstance(items, list) else []:
+            if isinstance(x, dict) and x.get("text"):
+                mode = x.get("parse_mode") or "HTML"
+                self.enqueue(x["text"], mode, msg_id=x.get("id") or message_id(x["text"], mode))
+        try:
+            os.remove(LEGACY_PENDING_HTML)
+        except OSError:
+            pass
+
+    def compact(self) -> None:
+        with self._lock:
+            events = [{"op": "done", "id": mid} for mid in self._done]
+            for mid, it in self._items.items():
+                events.append({
+                    "op": "add", "id": mid, "text": it["text"], "parse_mode": it["parse_mode"],
+                    "preview": it["preview"], "chats": list(it["chats"]),
+                    "attempts": it["attempts"], "ts": it["ts"],
+                })
+                events += [{"op": "sent", "id": mid, "chat": c} for c, ok in it["chats"].items() if ok]
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for ev in events:
+                    f.write(json.dumps(ev, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._lines = len(events)
+
+    def close(self) -> None:
+        """Сжать журнал, если в нём заметно больше строк, чем живых записей."""
+        live = len(self._done) + sum(1 + len(it["chats"]) for it in self._items.values())
+        if self._lines >= COMPACT_MIN_LINES and self._lines > 2 * live:
+            self.compact()
+
+    # --- API ---
+
+    def enqueue(
+        self,
+        text: str,
+        parse_mode: str,
+        msg_id: str,
+        disable_web_page_preview: bool = True,
+        chat_ids: Optional[List[str]] = None,
+    ) -> bool:
+        """Записать сообщение в журнал. False — такой id уже есть (в очереди или доставлен)."""
+        chats = _parse_chat_ids() if chat_ids is None else chat_ids
+        with self._lock:
+            if msg_id in self._items or msg_id in self._done:
+                return False
+            if not chats:
+                return False
+            self._append([{
+                "op": "add", "id": msg_id, "text": text, "parse_mode": parse_mode,
+                "preview": not disable_web_page_preview, "chats": list(chats), "ts": time.time(),
+            }])
+            return True
+
+    def send(self, msg_id: str) -> bool:
+        """
+        Одна попытка доставки в ещё не получившие чаты.
+        True — сообщение доставлено во все чаты (сейчас или раньше).
+        """
+        with self._lock:
+            it = self._items.get(msg_id)
+            if it is None:
+                return msg_id in self._done
+            todo = [c for c, ok in it["chats"].items() if not ok]
+            text, parse_mode, preview = it["text"], it["parse_mode"], it["preview"]
+
+        # сеть — без блокировки, параллельные send() разных сообщений не ждут друг друга
+        res = send_to_chats(text, parse_mode, not preview, SEND_RETRIES, chat_ids=todo) if todo else {}
+
+        with self._lock:
+            it = self._items.get(msg_id)
+            if it is None:
+                return msg_id in self._done
+            events = [{"op": "sent", "id": msg_id, "chat": c} for c in todo if res.get(c)]
+            delivered = all(ok or res.get(c) for c, ok in it["chats"].items())
+            if delivered:
+                events.append({"op": "done", "id": msg_id})
+            else:
+                events.append({"op": "fail", "id": msg_id})
+                if it["attempts"] + 1 >= MAX_ATTEMPTS or time.time() - it["ts"] > MAX_AGE_SECONDS:
+                    events.append({"op": "done", "id": msg_id})
+            self._append(events)
+            return delivered
+
+    def deliver(
+        self,
+        text: str,
+        parse_mode: str,
+        msg_id: str,
+        disable_web_page_preview: bool = True,
+    ) -> bool:
+        """enqueue + сразу одна попытка; при неудаче сообщение остаётся в outbox."""
+        self.enqueue(text, parse_mode, msg_id, disable_web_page_preview)
+        return self.send(msg_id)
+
+    def pending_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._items)
+
+    def drain(self, max_messages: int = DRAIN_MAX, deadline: Optional[float] = None) -> int:
+        """Дослать старые сообщения (в порядке добавления), не больше max_messages. Возвращает число доставленных."""
+        sent = 0
+        for mid in self.pending_ids()[:max(0, max_messages)]:
+            if deadline is not None and time.time() >= deadline:
+                break
+            if self.send(mid):
+                sent += 1
+        return sent
+
+
+_OUTBOX: Optional[Outbox] = None
+_OUTBOX_LOCK = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    global _OUTBOX
+    with _OUTBOX_LOCK:
+        if _OUTBOX is None:
+            _OUTBOX = Outbox()
+        return _OUTBOX
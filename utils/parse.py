@@ -1,10 +1,79 @@
+import base64
+import hashlib
 import re
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict
+
+from utils.keccak import to_checksum_address
 
 EVM_RE = re.compile(r"\b0x[a-fA-F0-9]{40}\b")
 SOL_RE = re.compile(r"\b[1-9A-HJ-NP-Za-km-z]{32,44}\b")
 TICKER_PARENS_RE = re.compile(r"\(([A-Za-z0-9\-\.]{1,15})\)")
 
+# Сканер адресов контрактов: один проход finditer по тексту одним regex, в который входят
+# и сами адреса (EVM / Sui, Aptos / Solana / Tron / TON), и слова-подсказки о сети.
+# Дешёвая проверка формата: EIP-55, base58 -> 32 байта, base58check у Tron, crc16 у TON.
+# Сеть — по ближайшей подсказке рядом с адресом (или по упоминанию где-то в тексте).
+# Результат: [(address, chain, confidence)], chain — id платформы CoinGecko или "evm".
+
+MIN_CONFIDENCE = 0.5
+CTX_BEFORE = 200
+CTX_AFTER = 60
+
+_B58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_B58_IDX = {c: i for i, c in enumerate(_B58)}
+
+# слово-подсказка -> (chain, семейство адресов)
+_CHAIN_WORDS: List[Tuple[List[str], str, str]] = [
+    (["erc20", "erc-20", "ethereum", "eth mainnet"], "ethereum", "evm"),
+    (["bep20", "bep-20", "bsc", "bnb smart chain", "bnb chain"], "binance-smart-chain", "evm"),
+    (["base chain", "base network", "base mainnet"], "base", "evm"),
+    (["arbitrum"], "arbitrum-one", "evm"),
+    (["polygon", "matic"], "polygon-pos", "evm"),
+    (["avalanche", "avax c-chain", "c-chain"], "avalanche", "evm"),
+    (["optimism", "op mainnet"], "optimistic-ethereum", "evm"),
+    (["solana", "spl"], "solana", "solana"),
+    (["trc20", "trc-20", "tron"], "tron", "tron"),
+    (["jetton", "ton", "the open network"], "the-open-network", "ton"),
+    (["sui"], "sui", "move"),
+    (["aptos"], "aptos", "move"),
+]
+_HINT_WORDS = ["contract", "address", "ca", "mint"]
+# рядом с ними обычно хэш транзакции, а не адрес
+_NEG_WORDS = ["tx hash", "txid", "txn", "tx", "hash", "transaction"]
+
+_WORDS: Dict[str, Tuple[str, Optional[str]]] = {w: ("hint", None) for w in _HINT_WORDS}
+_WORDS.update({w: ("neg", None) for w in _NEG_WORDS})
+for _words, _chain, _fam in _CHAIN_WORDS:
+    _WORDS.update({w: (_chain, _fam) for w in _words})
+
+
+def _words_re() -> str:
+    # длинные фразы первыми; перед alternation — дешёвый lookahead по первым двум буквам,
+    # иначе case-insensitive перебор всех фраз на каждом слове съедает большую часть времени
+    words = sorted(_WORDS, key=len, reverse=True)
+    first = "".join(sorted({c for w in words for c in (w[0], w[0].upper())}))
+    second = "".join(sorted({c for w in words for c in (w[1], w[1].upper())}))
+    return "(?=[%s][%s])(?i:(?P<word>%s))\\b" % (
+        re.escape(first), re.escape(second), "|".join(re.escape(w) for w in words)
+    )
+
+
+# \b в начале: внутри слов движок отсекает позицию одной проверкой
+_SCAN_RE = re.compile(
+    r"\b(?:"
+    r"(?P<hex>0x[0-9a-fA-F]{64}(?:::[A-Za-z_]\w*::[A-Za-z_]\w*)?|0x[0-9a-fA-F]{40})(?![0-9A-Za-z])"
+    r"|(?<![\-+/:])(?P<tonraw>0:[0-9a-fA-F]{64})(?![0-9A-Za-z])"
+    r"|(?<![\-+/])(?P<ton>[EUk0][Qf][A-Za-z0-9_\-+/]{46})(?![\w\-+/])"
+    r"|(?P<b58>[1-9A-HJ-NP-Za-km-z]{32,44})(?![0-9A-Za-z])"
+    r"|" + _words_re() + r")"
+)
+# любой адрес — сплошной кусок не меньше 32 символов; без такого куска текст не сканируется
+_LONG_RE = re.compile(r"[0-9A-Za-z_\-+/:]{32}")
+
+
+Candidate = Tuple[str, str, float]
+
+
 def extract_ticker(title: str) -> Optional[str]:
     if not title:
         return None
@@ -16,34 +85,170 @@ def extract_ticker(title: str) -> Optional[str]:
         return m2.group(1).upper()
     return None
 
-def extract_contracts(text: str) -> List[str]:
-    if not text:
+
+def _b58decode(s: str) -> Optional[bytes]:
+    n = 0
+    for c in s:
+        i = _B58_IDX.get(c)
+        if i is None:
+            return None
+        n = n * 58 + i
+    raw = n.to_bytes((n.bit_length() + 7) // 8, "big") if n else b""
+    pad = len(s) - len(s.lstrip("1"))
+    return b"\x00" * pad + raw
+
+
+def _crc16(data: bytes) -> int:
+    crc = 0
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+            crc &= 0xFFFF
+    return crc
+
+
+def _classify(addr: str, kind: str) -> Optional[Tuple[str, float]]:
+    """Проверка формата без контекста: (семейство, базовая уверенность) или None."""
+    if kind == "hex":
+        if len(addr) == 42:
+            body = addr[2:]
+            if body.islower() or body.isupper() or body.isdigit():
+                return "evm", 0.7
+            return ("evm", 0.9) if to_checksum_address(addr) == addr else ("evm", 0.3)
+        # 32-байтовый адрес Sui/Aptos; без "::тип" его не отличить от хэша транзакции
+        return "move", 0.8 if "::" in addr else 0.35
+
+    if kind == "tonraw":
+        return "ton", 0.8
+
+    if kind == "ton":
+        try:
+            raw = base64.urlsafe_b64decode(addr.replace("+", "-").replace("/", "_"))
+        except (ValueError, TypeError):
+            return None
+        if len(raw) != 36 or (raw[0] & 0x7F) not in (0x11, 0x51):
+            return None
+        if _crc16(raw[:34]) != int.from_bytes(raw[34:], "big"):
+            return None
+        return "ton", 0.9
+
+    if kind == "b58":
+        raw = _b58decode(addr)
+        if raw is None:
+            return None
+        if len(addr) == 34 and addr[0] == "T" and len(raw) == 25 and raw[0] == 0x41:
+            if hashlib.sha256(hashlib.sha256(raw[:21]).digest()).digest()[:4] == raw[21:]:
+                return "tron", 0.9
+            return None
+        if len(raw) != 32:
+            return None
+        # 32 байта даёт любое base58-слово нужной длины; настоящий адрес почти всегда с цифрами
+        if not any(c.isdigit() for c in addr):
+            return "solana", 0.1
+        return "solana", 0.3
+
+    return None
+
+
+_FAMILY_DEFAULT = {"evm": "evm", "solana": "solana", "tron": "tron", "ton": "the-open-network", "move": None}
+_FAMILY_BOOST = {"evm": 0.05, "solana": 0.5, "tron": 0.05, "ton": 0.05, "move": 0.45}
+
+
+def scan_contracts(text: str) -> List[Candidate]:
+    """
+    Все адреса в тексте: [(address, chain, confidence)], по убыванию confidence,
+    при равенстве — в порядке появления. Дубликаты схлопываются (остаётся лучший).
+    """
+    if not text or not _LONG_RE.search(text):
         return []
-    out = []
-    out += EVM_RE.findall(text)
 
-    low = text.lower()
-    if "solana" in low or "spl" in low:
-        out += SOL_RE.findall(text)
+    found = []   # (start, end, addr, family, base)
+    hints = []   # start позиций слов contract/address
+    negs = []    # start позиций tx/hash — рядом с ними обычно хэш, а не адрес
+    ctx = []     # (start, chain, family)
+
+    for m in _SCAN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind in ("hex", "tonraw", "ton", "b58"):
+            addr = m.group(kind)
+            cls = _classify(addr, kind)
+            if cls:
+                found.append((m.start(), m.end(), addr, cls[0], cls[1]))
+        else:
+            what, fam = _WORDS[m.group("word").lower()]
+            if what == "hint":
+                hints.append(m.start())
+            elif what == "neg":
+                negs.append(m.start())
+            else:
+                ctx.append((m.start(), what, fam))
+
+    doc_chains: Dict[str, str] = {}
+    for _, ch, fam in ctx:
+        doc_chains.setdefault(fam, ch)
+
+    best: Dict[str, Candidate] = {}
+    order: Dict[str, int] = {}
+    for start, end, addr, fam, conf in found:
+        chain = _FAMILY_DEFAULT[fam]
+
+        # ближайшая подсказка той же семьи: перед адресом в CTX_BEFORE или сразу после
+        # (подсказка перед адресом — "ERC20: 0x..." — весит больше, чем после)
+        near = None
+        for pos, ch, cfam in ctx:
+            if cfam != fam:
+                continue
+            if start - CTX_BEFORE <= pos < start or end <= pos <= end + CTX_AFTER:
+                dist = start - pos if pos < start else (pos - end) * 4
+                if near is None or dist < near[0]:
+                    near = (dist, ch)
+        if near:
+            chain = near[1]
+            conf += _FAMILY_BOOST[fam]
+        elif fam in doc_chains:
+            chain = doc_chains[fam]
+            conf += _FAMILY_BOOST[fam] / 2
+
+        if any(start - 80 <= h < start for h in hints):
+            conf += 0.1
+        if any(start - 40 <= n < start for n in negs):
+            conf -= 0.4
+
+        if chain is None:
+            # 32-байтовый hex без подсказки sui/aptos
+            chain = "sui" if "::" in addr else "move"
+
+        conf = round(max(0.0, min(conf, 0.99)), 3)
+        prev = best.get(addr)
+        if prev is None or conf > prev[2]:
+            best[addr] = (addr, chain, conf)
+        order.setdefault(addr, len(order))
+
+    return sorted(best.values(), key=lambda c: (-c[2], order[c[0]]))
+
+
+def extract_contracts(text: str) -> List[str]:
+    """Адреса с confidence >= MIN_CONFIDENCE, лучшие первыми."""
+    return [a for a, _, conf in scan_contracts(text) if conf >= MIN_CONFIDENCE]
 
-    seen = set()
-    deduped = []
-    for c in out:
-        if c not in seen:
-            seen.add(c)
-            deduped.append(c)
-    return deduped
 
 def pick_best_contract(contracts: List[str]) -> Optional[str]:
+    """
+    Лучший из уже выделенных адресов (например, из метаданных биржи):
+    по проверке формата, при равенстве — первый.
+    """
     if not contracts:
         return None
+    best, best_conf = None, -1.0
     for c in contracts:
-        if c.startswith("0x") and len(c) == 42:
-            return c
-    return contracts[0]
+        conf = max((cand[2] for cand in scan_contracts(c) if cand[0] == c), default=0.0)
+        if conf > best_conf:
+            best, best_conf = c, conf
+    return best
+
 
 def summarize(title: str, body: str) -> Tuple[Optional[str], Optional[str]]:
     ticker = extract_ticker(title or "")
     contracts = extract_contracts((title or "") + "\n" + (body or ""))
-    best = pick_best_contract(contracts)
-    return ticker, best
+    return ticker, (contracts[0] if contracts else None)
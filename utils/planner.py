@@ -0,0 +1,241 @@
+import calendar
+import math
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+# Статистика по биржам хранится в state["exchange_stats"]:
+#   { eid: {"avg_seconds": float, "fail_rate": float, "runs": int, "failures": int, "last_run": int,
+#           "heat": float, "heat_ts": int} }
+#
+# heat — число листингов с экспоненциальным затуханием (период полураспада PLAN_HEAT_HALF_LIFE_DAYS),
+# т.е. частота и свежесть листингов одним числом; хранится «на момент heat_ts» и пересчитывается
+# только при сканировании. По heat (с весом биржи из PLAN_WEIGHTS) считается, раз в сколько
+# запусков биржу сканировать: горячие — каждый запуск, «спящие» — раз в PLAN_COLD_ROTATION.
+# Гарантия покрытия: любая биржа, не сканировавшаяся max_rotation запусков, берётся обязательно.
+#
+# План детерминирован: зависит только от списка бирж, этой статистики и номера запуска (epoch),
+# поэтому каждый шард считает одинаковый план по одному и тому же state-файлу.
+
+DEFAULT_COST_SECONDS = 10.0
+MIN_COST_SECONDS = 0.5
+EWMA_ALPHA = 0.3
+
+ADAPTIVE = os.getenv("PLAN_ADAPTIVE", "1") != "0"
+HEAT_HALF_LIFE_DAYS = float(os.getenv("PLAN_HEAT_HALF_LIFE_DAYS", "14"))
+# heat (с весом), при котором источник сканируется каждый запуск
+HOT_HEAT = float(os.getenv("PLAN_HOT_HEAT", "1.0"))
+COLD_ROTATION = int(os.getenv("PLAN_COLD_ROTATION", "3"))
+# у «спящих» приоритет не нулевой — при нехватке бюджета они стареют и всё равно доходят до очереди
+HEAT_FLOOR = 0.05
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    # "binance=3,okx=2" — во сколько раз листинг на бирже ценнее обычного
+    out = {}
+    for part in (raw or "").split(","):
+        k, _, v = part.partition("=")
+        try:
+            out[k.strip().lower()] = float(v)
+        except ValueError:
+            continue
+    return out
+
+
+WEIGHTS = _parse_weights(os.getenv("PLAN_WEIGHTS", ""))
+
+
+def current_epoch() -> int:
+    """
+    Номер запуска, общий для всех шардов одного workflow run.
+    PLAN_EPOCH > GITHUB_RUN_NUMBER > номер 20-минутного слота.
+    """
+    for k in ("PLAN_EPOCH", "GITHUB_RUN_NUMBER"):
+        v = (os.getenv(k) or "").strip()
+        if v.isdigit():
+            return int(v)
+    return int(time.time() // (20 * 60))
+
+
+def exchange_cost(stats: Dict[str, Any], eid: str) -> float:
+    st = stats.get(eid) or {}
+    try:
+        cost = float(st.get("avg_seconds", DEFAULT_COST_SECONDS))
+    except Exception:
+        cost = DEFAULT_COST_SECONDS
+    return max(MIN_COST_SECONDS, cost)
+
+
+def record_result(stats: Dict[str, Any], eid: str, seconds: float, ok: bool, epoch: int) -> None:
+    st = stats.get(eid)
+    if not isinstance(st, dict):
+        st = {"avg_seconds": round(float(seconds), 3), "fail_rate": 0.0 if ok else 1.0, "runs": 0, "failures": 0}
+    else:
+        prev = float(st.get("avg_seconds", seconds))
+        st["avg_seconds"] = round(prev + EWMA_ALPHA * (float(seconds) - prev), 3)
+        prev_fr = float(st.get("fail_rate", 0.0))
+        st["fail_rate"] = round(prev_fr + EWMA_ALPHA * ((0.0 if ok else 1.0) - prev_fr), 3)
+
+    st["runs"] = int(st.get("runs", 0)) + 1
+    if not ok:
+        st["failures"] = int(st.get("failures", 0)) + 1
+    st["last_run"] = int(epoch)
+    stats[eid] = st
+
+
+def _decayed(heat: float, seconds: float) -> float:
+    return heat * 0.5 ** (max(0.0, seconds) / (HEAT_HALF_LIFE_DAYS * 86400))
+
+
+def record_listings(stats: Dict[str, Any], key: str, new: int, now: Optional[float] = None) -> None:
+    """Учесть new листингов у источника key (биржа ccxt или html-источник) по итогам скана."""
+    now = time.time() if now is None else now
+    st = stats.get(key)
+    if not isinstance(st, dict):
+        st = {}
+        stats[key] = st
+    try:
+        heat = _decayed(float(st.get("heat", 0.0)), now - float(st.get("heat_ts", now)))
+    except (TypeError, ValueError):
+        heat = 0.0
+    st["heat"] = round(heat + max(0, int(new)), 4)
+    st["heat_ts"] = int(now)
+
+
+def seed_heat(stats: Dict[str, Any], snapshots: Dict[str, Any]) -> None:
+    """
+    Начальный heat из истории снимков (new_count, last_new) для бирж, у которых его ещё нет.
+    Значение «на момент last_new» — без текущего времени, чтобы все шарды получили одно и то же.
+    """
+    for ex_key, snap in snapshots.items():
+        if not isinstance(snap, dict) or not snap.get("new_count"):
+            continue
+        eid = ex_key.lower()
+        st = stats.get(eid)
+        if isinstance(st, dict) and "heat" in st:
+            continue
+        try:
+            ts = calendar.timegm(time.strptime(snap.get("last_new") or "", "%Y-%m-%d %H:%M:%S UTC"))
+        except ValueError:
+            continue
+        # при первом деплое exchange_stats пуст — запись создаём здесь
+        if not isinstance(st, dict):
+            st = stats[eid] = {}
+        st["heat"] = float(int(snap["new_count"]))
+        st["heat_ts"] = int(ts)
+
+
+def heat(stats: Dict[str, Any], key: str) -> float:
+    st = stats.get(key) or {}
+    try:
+        return float(st.get("heat", 0.0)) * WEIGHTS.get(key.lower(), 1.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def rotation(stats: Dict[str, Any], key: str, max_rotation: int = COLD_ROTATION) -> int:
+    """Раз в сколько запусков сканировать источник: 1 для горячих, до max_rotation для спящих."""
+    if not ADAPTIVE:
+        return 1
+    cold = max(1, max_rotation)
+    h = heat(stats, key)
+    if h <= 0:
+        return cold
+    return max(1, min(cold, int(math.ceil(HOT_HEAT / h))))
+
+
+def priority(stats: Dict[str, Any], key: str) -> float:
+    """Ожидаемая польза скана на секунду загрузки."""
+    return (heat(stats, key) + HEAT_FLOOR) / exchange_cost(stats, key)
+
+
+def _staleness(stats: Dict[str, Any], eid: str, epoch: int) -> float:
+    last = (stats.get(eid) or {}).get("last_run")
+    if not isinstance(last, int):
+        return math.inf
+    return max(0, epoch - last)
+
+
+def is_due(stats: Dict[str, Any], key: str, epoch: int, cold_rotation: int = COLD_ROTATION) -> bool:
+    if not ADAPTIVE:
+        return True
+    return _staleness(stats, key, epoch) >= rotation(stats, key, cold_rotation)
+
+
+def select_for_run(
+    eids: List[str],
+    stats: Dict[str, Any],
+    epoch: int,
+    capacity: float,
+    max_rotation: int,
+) -> List[str]:
+    """
+    Какие биржи сканируем в этом запуске (по всем шардам вместе).
+    Кандидаты — биржи, у которых подошла очередь (rotation(): горячие каждый запуск,
+    спящие реже). Сначала обязательные — не сканировались max_rotation запусков и больше,
+    затем ни разу не сканированные, затем по приоритету (heat на секунду загрузки,
+    с учётом того, сколько запусков биржа уже ждёт), пока суммарная стоимость влезает в capacity.
+    """
+    cold = min(COLD_ROTATION, max(1, max_rotation))
+
+    def prio(eid: str):
+        stale = _staleness(stats, eid, epoch)
+        return (
+            -(stale >= max_rotation),
+            -(stale == math.inf),
+            -priority(stats, eid) * min(stale, max_rotation),
+            float((stats.get(eid) or {}).get("fail_rate", 0.0)),
+            eid,
+        )
+
+    chosen = []
+    used = 0.0
+    for eid in sorted((e for e in eids if is_due(stats, e, epoch, cold)), key=prio):
+        cost = exchange_cost(stats, eid)
+        stale = _staleness(stats, eid, epoch)
+        overdue = stale != math.inf and stale >= max_rotation
+        if overdue or used + cost <= capacity:
+            chosen.append(eid)
+            used += cost
+    return chosen
+
+
+def pack_shards(eids: List[str], stats: Dict[str, Any], shard_total: int) -> List[List[str]]:
+    """
+    LPT bin-packing: самые дорогие биржи — в наименее загруженный шард.
+    """
+    shard_total = max(1, shard_total)
+    bins: List[List[str]] = [[] for _ in range(shard_total)]
+    loads = [0.0] * shard_total
+
+    for eid in sorted(eids, key=lambda e: (-exchange_cost(stats, e), e)):
+        i = min(range(shard_total), key=lambda k: (loads[k], k))
+        bins[i].append(eid)
+        loads[i] += exchange_cost(stats, eid)
+    return bins
+
+
+def plan_shard(
+    eids: List[str],
+    stats: Dict[str, Any],
+    shard_index: int,
+    shard_total: int,
+    epoch: int,
+    shard_capacity: float,
+    max_rotation: int = 6,
+    max_exchanges: Optional[int] = None,
+) -> List[str]:
+    """
+    Список бирж для шарда shard_index в запуске epoch.
+    shard_capacity — сколько «секунд загрузки» шард успевает за запуск
+    (бюджет * параллельность).
+    """
+    chosen = select_for_run(eids, stats, epoch, shard_capacity * max(1, shard_total), max_rotation)
+    bins = pack_shards(chosen, stats, shard_total)
+    mine = bins[shard_index % max(1, shard_total)]
+
+    # дешёвые первыми: при нехватке времени отвалится меньше бирж
+    mine.sort(key=lambda e: (exchange_cost(stats, e), e))
+    if max_exchanges is not None:
+        mine = mine[:max_exchanges]
+    return mine
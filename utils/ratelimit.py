@@ -0,0 +1,170 @@
+import asyncio
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+# Общий token-bucket лимитер, по одному на host.
+#   acquire() / acquire_async() — перед запросом (блокирует, пока нет токена или идёт пауза)
+#   feedback(status, headers)   — после ответа: 429/Retry-After режет скорость вдвое и ставит паузу,
+#                                 успешные ответы потихоньку возвращают скорость к max_rate (AIMD)
+#
+# Переопределение: RATE_LIMITS="api.coingecko.com=0.5:3:0.8,api.dexscreener.com=5"
+#   host=rate[:burst[:max_rate]]  (rate в запросах/сек)
+
+# api.telegram.org — общий лимит бота (~30 msg/sec); лимит на чат (TG_CHAT_INTERVAL) — в utils.tg.
+# Старый TG_MIN_INTERVAL (сек между любыми сообщениями) по-прежнему задаёт общий лимит,
+# если TG_GLOBAL_RATE не указан.
+_TG_MIN_INTERVAL = float(os.getenv("TG_MIN_INTERVAL") or 0)
+_TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE") or (1.0 / _TG_MIN_INTERVAL if _TG_MIN_INTERVAL > 0 else 25))
+_TG_BURST = 1 if (_TG_MIN_INTERVAL > 0 and not os.getenv("TG_GLOBAL_RATE")) else 5
+
+# host -> (rate, burst, max_rate)
+DEFAULT_LIMITS: Dict[str, Tuple[float, float, float]] = {
+    "api.coingecko.com": (0.4, 3, 0.5),            # free tier ~30/min
+    "api.dexscreener.com": (4.0, 5, 5.0),          # 300/min
+    "api.telegram.org": (_TG_GLOBAL_RATE, _TG_BURST, _TG_GLOBAL_RATE),
+}
+FALLBACK_LIMIT = (5.0, 5, 10.0)
+
+
+class TokenBucket:
+    def __init__(self, name: str, rate: float, burst: float = 1, max_rate: Optional[float] = None):
+        self.name = name
+        self.rate = float(rate)
+        self.base_rate = float(rate)
+        self.max_rate = float(max_rate or rate)
+        self.min_rate = self.base_rate / 16
+        self.burst = max(1.0, float(burst))
+
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.throttles = 0
+
+    def _reserve(self) -> float:
+        """Забирает токен (в долг, если нужно); возвращает, сколько ждать."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            wait = max(wait, self._paused_until - now)
+
+            self.requests += 1
+            if wait > 0:
+                self.waits += 1
+                self.wait_seconds += wait
+            return wait
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + min(pause, 120.0))
+            self._tokens = min(self._tokens, 0.0)
+
+    def success(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.base_rate * 0.05)
+
+    def feedback(self, status: int, headers: Optional[Dict[str, Any]] = None) -> Optional[float]:
+        """
+        Учесть ответ сервера. Возвращает retry_after (сек), если это был 429/503 с паузой.
+        """
+        retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+        if status == 429 or (status == 503 and retry_after is not None):
+            self.throttle(retry_after)
+            return retry_after if retry_after is not None else 1.0 / self.rate
+        if status < 400:
+            self.success()
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": round(self.rate, 4),
+            "requests": self.requests,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "throttles": self.throttles,
+        }
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        dt = parsedate_to_datetime(str(value))
+        return max(0.0, dt.timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _load_limits() -> Dict[str, Tuple[float, float, float]]:
+    limits = dict(DEFAULT_LIMITS)
+    raw = (os.getenv("RATE_LIMITS") or "").strip()
+    for part in raw.split(","):
+        if "=" not in part:
+            continue
+        host, spec = part.split("=", 1)
+        try:
+            nums = [float(x) for x in spec.split(":") if x.strip()]
+        except ValueError:
+            continue
+        if not nums:
+            continue
+        rate = nums[0]
+        burst = nums[1] if len(nums) > 1 else 1
+        max_rate = nums[2] if len(nums) > 2 else rate
+        limits[host.strip().lower()] = (rate, burst, max_rate)
+    return limits
+
+
+_LIMITS = _load_limits()
+_BUCKETS: Dict[str, TokenBucket] = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def limiter(host_or_url: str) -> TokenBucket:
+    host = host_or_url
+    if "://" in host_or_url:
+        host = urlparse(host_or_url).hostname or host_or_url
+    host = host.lower()
+
+    with _BUCKETS_LOCK:
+        b = _BUCKETS.get(host)
+        if b is None:
+            rate, burst, max_rate = _LIMITS.get(host, FALLBACK_LIMIT)
+            b = TokenBucket(host, rate, burst, max_rate)
+            _BUCKETS[host] = b
+        return b
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    with _BUCKETS_LOCK:
+        return {host: b.stats() for host, b in _BUCKETS.items()}
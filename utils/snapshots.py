@@ -0,0 +1,95 @@
+import hashlib
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+# Снимок биржи в state["snapshots"]:
+#   {
+#     "GATE": {
+#       "hash": "<sha1 отсортированного списка>",
+#       "codes": ["AAA", "BBB", ...],          # sorted
+#       "gone": {"CCC": "2026-01-15 22:00:55 UTC"},   # делистнутые (для relisting)
+#       "new_count": 12, "last_new": "..."     # история листингов
+#     },
+#   }
+
+
+def normalize_codes(codes: Iterable[Any]) -> List[str]:
+    out = set()
+    for c in codes:
+        t = (c or "").upper().strip() if isinstance(c, str) else ""
+        if t:
+            out.add(t)
+    return sorted(out)
+
+
+def codes_hash(codes: List[str]) -> str:
+    """codes должны быть уже нормализованы (normalize_codes)."""
+    return hashlib.sha1("\n".join(codes).encode("utf-8")).hexdigest()[:20]
+
+
+def diff_codes(prev: Optional[Dict[str, Any]], codes: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    (added, removed) относительно предыдущего снимка. Без снимка — всё added.
+    """
+    if not prev:
+        return list(codes), []
+    old = set(prev.get("codes") or [])
+    cur = set(codes)
+    return sorted(cur - old), sorted(old - cur)
+
+
+def make_snapshot(
+    prev: Optional[Dict[str, Any]],
+    codes: List[str],
+    added: List[str],
+    removed: List[str],
+    now: str,
+) -> Dict[str, Any]:
+    prev = prev or {}
+    gone = dict(prev.get("gone") or {})
+    for c in removed:
+        gone[c] = now
+    for c in added:
+        gone.pop(c, None)
+
+    snap = {
+        "hash": codes_hash(codes),
+        "codes": codes,
+        "gone": gone,
+        "new_count": int(prev.get("new_count", 0)),
+        "last_new": prev.get("last_new"),
+    }
+    if prev and added:
+        snap["new_count"] += len(added)
+        snap["last_new"] = now
+    return snap
+
+
+def migrate_seen_map(seen_map: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Старый формат {"EXCHANGE:TICKER": found_at} -> снимки по биржам.
+    Листингом считаем всё, что найдено позже первого прохода по бирже (> 1 часа).
+    """
+    by_ex: Dict[str, Dict[str, str]] = {}
+    for key, found_at in seen_map.items():
+        if not isinstance(key, str) or ":" not in key:
+            continue
+        ex, code = key.split(":", 1)
+        by_ex.setdefault(ex, {})[code] = found_at if isinstance(found_at, str) else ""
+
+    out = {}
+    for ex, items in by_ex.items():
+        codes = normalize_codes(items.keys())
+        stamps = sorted(v for v in items.values() if v)
+        new = []
+        if stamps:
+            # "YYYY-MM-DD HH:MM:SS UTC" — сравнение по часу первого прохода
+            first_hour = stamps[0][:13]
+            new = [s for s in stamps if s[:13] > first_hour]
+        out[ex] = {
+            "hash": codes_hash(codes),
+            "codes": codes,
+            "gone": {},
+            "new_count": len(new),
+            "last_new": new[-1] if new else None,
+        }
+    return out
@@ -0,0 +1,220 @@
+import hashlib
+import json
+from typing import Dict, Any, Callable, List, Optional
+
+from utils import httpclient, metrics
+from utils.cache import DiskCache
+from utils.links import extract_links, keyword_matcher, MAX_LINKS
+
+# Источники анонсов: реестр адаптеров по полю type в exchanges.yaml.
+# Каждый адаптер — fetch(cfg, headers) -> (response, links | None); общая обёртка scan_source()
+# делает conditional GET и сравнение набора ссылок, поэтому все типы отдают одно и то же:
+#   None                                — ничего не изменилось
+#   {"links": [{"title", "url", ...}], "state": {...}}
+# state сохраняется через commit_state() после того, как все ссылки обработаны.
+#
+#   type: html — страница со ссылками (utils/links.py)
+#   type: json — JSON API: items_path, fields {title, url, time, body}, url_template, пагинация
+
+# exchange name -> {"etag", "last_modified", "hash"} последней полностью обработанной версии
+_PAGE_STATE = DiskCache("listing_page", version=1)
+PAGE_STATE_TTL = 7 * 24 * 3600
+
+Adapter = Callable[[Dict[str, Any], Dict[str, str]], Any]
+ADAPTERS: Dict[str, Adapter] = {}
+
+
+def register(kind: str):
+    def deco(fn: Adapter) -> Adapter:
+        ADAPTERS[kind] = fn
+        return fn
+    return deco
+
+
+def is_supported(cfg: Dict[str, Any]) -> bool:
+    return cfg.get("type") in ADAPTERS and bool((cfg.get("name") or "").strip()) and bool(cfg.get("url"))
+
+
+def links_hash(links: List[Dict[str, Any]]) -> str:
+    base = "\n".join(sorted(f"{it['url']}|{it['title']}" for it in links)).encode("utf-8")
+    return hashlib.sha256(base).hexdigest()[:24]
+
+
+def scan_source(cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    ex_name = (cfg.get("name") or "").strip()
+    hit, prev = _PAGE_STATE.get(ex_name, PAGE_STATE_TTL)
+    prev = prev if hit and prev else {}
+
+    headers = {}
+    if prev.get("etag"):
+        headers["If-None-Match"] = prev["etag"]
+    if prev.get("last_modified"):
+        headers["If-Modified-Since"] = prev["last_modified"]
+
+    with metrics.timer("source_scan_seconds", source=ex_name):
+        r, links = ADAPTERS[cfg["type"]](cfg, headers)
+    if links is None:
+        metrics.inc("source_not_modified", source=ex_name)
+        return None
+
+    state = {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "hash": links_hash(links),
+    }
+
+    if prev.get("hash") == state["hash"]:
+        # ссылки те же — только обновим валидаторы, чтобы в следующий раз получить 304
+        _PAGE_STATE.set(ex_name, state)
+        metrics.inc("source_unchanged", source=ex_name)
+        return None
+
+    return {"links": links, "state": state}
+
+
+def commit_state(cfg: Dict[str, Any], state: Dict[str, Any]) -> None:
+    _PAGE_STATE.set((cfg.get("name") or "").strip(), state)
+
+
+def _get(url: str, headers: Dict[str, str], params: Optional[Dict[str, Any]] = None):
+    r = httpclient.get(url, timeout=30, headers=headers, params=params)
+    if r.status_code == 304:
+        return r, True
+    r.raise_for_status()
+    return r, False
+
+
+@register("html")
+def fetch_html_source(cfg: Dict[str, Any], headers: Dict[str, str]):
+    r, not_modified = _get(cfg["url"], headers)
+    if not_modified:
+        return r, None
+    with metrics.timer("html_parse_seconds", kind="links"):
+        return r, extract_links(r.text, cfg)
+
+
+# --- json ---
+
+def json_path(obj: Any, path: Optional[str]) -> Any:
+    """
+    Упрощённый JSONPath: "data.catalogs.0.articles", "data.*.items" ("*" — по всем элементам списка
+    или значениям словаря, результат склеивается). Пустой путь — сам объект.
+    """
+    if not path:
+        return obj
+    cur = [obj]
+    flat = False
+    for part in path.strip().lstrip("$").strip(".").split("."):
+        nxt = []
+        for o in cur:
+            if part == "*":
+                if isinstance(o, list):
+                    nxt.extend(o)
+                elif isinstance(o, dict):
+                    nxt.extend(o.values())
+            elif isinstance(o, list):
+                try:
+                    nxt.append(o[int(part)])
+                except (ValueError, IndexError):
+                    pass
+            elif isinstance(o, dict) and part in o:
+                nxt.append(o[part])
+        if part == "*":
+            flat = True
+        cur = nxt
+    if flat:
+        out = []
+        for o in cur:
+            out.extend(o if isinstance(o, list) else [o])
+        return out
+    return cur[0] if cur else None
+
+
+def _json_items(cfg: Dict[str, Any], data: Any) -> List[Dict[str, Any]]:
+    fields = cfg.get("fields") or {}
+    tpl = cfg.get("url_template")
+    kw_re = keyword_matcher(cfg.get("keywords_any", []))
+
+    raw = json_path(data, cfg.get("items_path"))
+    if not isinstance(raw, list):
+        return []
+
+    out = []
+    for entry in raw:
+        if not isinstance(entry, dict):
+            continue
+        vals = {k: json_path(entry, p) for k, p in fields.items()}
+        title = str(vals.get("title") or "").strip()
+        if not title:
+            continue
+        if kw_re is not None and not kw_re.search(title):
+            continue
+
+        url = vals.get("url")
+        if tpl:
+            try:
+                url = tpl.format_map({k: ("" if v is None else v) for k, v in vals.items()})
+            except (KeyError, IndexError, ValueError):
+                continue
+        if not url:
+            continue
+
+        it = {"title": title, "url": str(url)}
+        if vals.get("time") is not None:
+            it["time"] = vals["time"]
+        if vals.get("body"):
+            it["body"] = str(vals["body"])
+        out.append(it)
+    return out
+
+
+@register("json")
+def fetch_json_source(cfg: Dict[str, Any], headers: Dict[str, str]):
+    """
+    exchanges.yaml:
+      items_path: "data.catalogs.0.articles"
+      fields: {title: "title", url: "code", time: "releaseDate"}
+      url_template: "https://.../detail/{url}"      # опц., подставляются поля из fields
+      params: {pageSize: 20}                         # опц.
+      page_param: "pageNo", page_start: 1, pages: 1  # опц. пагинация
+    Conditional GET — только по первой странице.
+    """
+    page_param = cfg.get("page_param")
+    pages = max(1, int(cfg.get("pages") or 1)) if page_param else 1
+    page = int(cfg.get("page_start", 1))
+
+    first = None
+    links: List[Dict[str, Any]] = []
+    seen_urls = set()
+
+    for i in range(pages):
+        params = dict(cfg.get("params") or {})
+        if page_param:
+            params[page_param] = page + i
+
+        r, not_modified = _get(cfg["url"], headers if i == 0 else {}, params=params or None)
+        if i == 0:
+            first = r
+            if not_modified:
+                return r, None
+        elif not_modified:
+            break
+
+        with metrics.timer("html_parse_seconds", kind="json"):
+            try:
+                data = r.json()
+            except (ValueError, json.JSONDecodeError):
+                break
+            items = _json_items(cfg, data)
+
+        if not items and not json_path(data, cfg.get("items_path")):
+            break
+        for it in items:
+            if it["url"] in seen_urls:
+                continue
+            seen_urls.add(it["url"])
+            links.append(it)
+        if len(links) >= MAX_LINKS:
+            break
+
+    return first, links[:MAX_LINKS]
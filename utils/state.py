@@ -1,19 +1,48 @@
 import json
 from pathlib import Path
-from typing import Set
+from typing import Optional, Set
+
+from utils.store import backend, get_store, Store
 
 STATE_PATH = Path("data/seen.json")
+SEEN_NS = "seen_html"
 
-def load_seen() -> Set[str]:
+def _load_seen_json() -> Set[str]:
     if not STATE_PATH.exists():
         STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
         STATE_PATH.write_text(json.dumps({"seen_ids": []}, indent=2))
     data = json.loads(STATE_PATH.read_text(encoding="utf-8"))
     return set(data.get("seen_ids", []))
 
-def save_seen(seen: Set[str]) -> None:
+def load_seen() -> Set[str]:
+    if backend() != "sqlite":
+        return _load_seen_json()
+
+    store = get_store()
+    if store.is_empty(SEEN_NS):
+        # первый запуск на sqlite — импорт из JSON (updated=0, в дельту не попадёт)
+        store.put_many(SEEN_NS, {sid: 1 for sid in _load_seen_json()}, updated=0)
+    return store.keys(SEEN_NS)
+
+def save_seen(seen: Set[str], known: Optional[Set[str]] = None) -> None:
+    """known — что уже записано (если вызывающий это знает): не перечитываем ns из sqlite."""
+    if backend() == "sqlite":
+        # пишем только новые id
+        store = get_store()
+        if known is None:
+            known = store.keys(SEEN_NS)
+        store.put_many(SEEN_NS, {sid: 1 for sid in seen if sid not in known})
+        return
+
     STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
     STATE_PATH.write_text(
         json.dumps({"seen_ids": sorted(list(seen))}, indent=2),
         encoding="utf-8"
     )
+
+def export_seen_json(store: Store) -> None:
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    STATE_PATH.write_text(
+        json.dumps({"seen_ids": sorted(store.keys(SEEN_NS))}, indent=2),
+        encoding="utf-8"
+    )
@@ -2,17 +2,118 @@ import json
 from pathlib import Path
 from typing import Dict, Any
 
-def load_state(path: str) -> Dict[str, Any]:
+from utils.store import backend, get_store, Store
+from utils.snapshots import migrate_seen_map
+
+CCXT_STATE_PATH = "data/seen_ccxt.json"
+
+# что было загружено из sqlite: path -> {section: {key: json}} — чтобы save писал только изменения
+_LOADED: Dict[str, Dict[str, Dict[str, str]]] = {}
+
+def _load_state_json(path: str) -> Dict[str, Any]:
     p = Path(path)
     if not p.exists():
         p.parent.mkdir(parents=True, exist_ok=True)
-        p.write_text(json.dumps({"seen": {}}, indent=2), encoding="utf-8")
+        p.write_text(json.dumps({"snapshots": {}}, indent=2), encoding="utf-8")
     data = json.loads(p.read_text(encoding="utf-8"))
-    if "seen" not in data or not isinstance(data["seen"], dict):
-        data["seen"] = {}
+    if "snapshots" not in data or not isinstance(data["snapshots"], dict):
+        data["snapshots"] = {}
+
+    # старый формат {"seen": {"EXCHANGE:TICKER": found_at}} -> снимки по биржам
+    legacy = data.pop("seen", None)
+    if isinstance(legacy, dict) and legacy:
+        for ex_key, snap in migrate_seen_map(legacy).items():
+            data["snapshots"].setdefault(ex_key, snap)
+    return data
+
+def _ns(path: str, section: str) -> str:
+    # data/seen_ccxt.json + "snapshots" -> "seen_ccxt:snapshots"
+    return f"{Path(path).stem}:{section}"
+
+def _dump(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+def _load_state_sqlite(path: str) -> Dict[str, Any]:
+    store = get_store()
+    prefix = f"{Path(path).stem}:"
+
+    if not store.namespaces(prefix):
+        # первый запуск на sqlite — импорт JSON (updated=0)
+        for section, v in _load_state_json(path).items():
+            if isinstance(v, dict):
+                store.put_many(prefix + section, v, updated=0)
+
+    data: Dict[str, Any] = {}
+    for ns in store.namespaces(prefix):
+        data[ns[len(prefix):]] = store.get_all(ns)
+    if not isinstance(data.get("snapshots"), dict):
+        data["snapshots"] = {}
+
+    _LOADED[path] = {
+        section: {k: _dump(v) for k, v in items.items()}
+        for section, items in data.items()
+    }
     return data
 
+def load_state(path: str) -> Dict[str, Any]:
+    if backend() == "sqlite":
+        return _load_state_sqlite(path)
+    return _load_state_json(path)
+
+def _dumps_compact(data: Dict[str, Any]) -> str:
+    """
+    Одна запись второго уровня на строку: {"snapshots": {"GATE": {...}, ...}} —
+    компактно, но git diff остаётся построчным по биржам.
+    """
+    parts = []
+    for k, v in data.items():
+        key = json.dumps(k, ensure_ascii=False)
+        if isinstance(v, dict) and v:
+            rows = [
+                f"    {json.dumps(k2, ensure_ascii=False)}: {json.dumps(v2, ensure_ascii=False, separators=(',', ':'))}"
+                for k2, v2 in v.items()
+            ]
+            parts.append(f"  {key}: {{\n" + ",\n".join(rows) + "\n  }")
+        else:
+            parts.append(f"  {key}: {json.dumps(v, ensure_ascii=False, separators=(',', ':'))}")
+    return "{\n" + ",\n".join(parts) + "\n}\n"
+
+def _save_state_sqlite(path: str, data: Dict[str, Any]) -> None:
+    store = get_store()
+    loaded = _LOADED.setdefault(path, {})
+
+    for section, items in data.items():
+        if not isinstance(items, dict):
+            continue
+        before = loaded.get(section) or {}
+        now = {k: _dump(v) for k, v in items.items()}
+
+        changed = {k: items[k] for k, s in now.items() if before.get(k) != s}
+        removed = [k for k in before if k not in now]
+
+        store.put_many(_ns(path, section), changed)
+        store.delete_many(_ns(path, section), removed)
+        loaded[section] = now
+
+    # секции, которые пропали целиком (например legacy "seen" после миграции)
+    for section in [s for s in loaded if s not in data]:
+        store.delete_many(_ns(path, section), list(loaded.pop(section).keys()))
+
 def save_state(path: str, data: Dict[str, Any]) -> None:
+    if backend() == "sqlite":
+        _save_state_sqlite(path, data)
+        return
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(_dumps_compact(data), encoding="utf-8")
+
+def export_state_json(store: Store, path: str = CCXT_STATE_PATH) -> None:
+    prefix = f"{Path(path).stem}:"
+    data: Dict[str, Any] = {"snapshots": {}}
+    for ns in sorted(store.namespaces(prefix)):
+        items = store.get_all(ns)
+        if items:
+            data[ns[len(prefix):]] = dict(sorted(items.items()))
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    p.write_text(_dumps_compact(data), encoding="utf-8")
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, Any, List, Optional, Iterable, Set
+
+# SQLite key-value хранилище состояния (WAL).
+#
+# Строка = (ns, key, value, updated):
+#   ns      — пространство имён ("seen_html", "seen_ccxt:snapshots", ...)
+#   value   — JSON; NULL = удалено (tombstone, нужен для merge)
+#   updated — unix time записи; у импортированных из JSON строк = 0,
+#             поэтому «дельта» шарда — это всё, что updated > 0.
+#
+# JSON-файлы в data/ остаются форматом импорта/экспорта (их коммитит workflow).
+
+DB_PATH = os.getenv("STATE_DB", "data/state.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    ns      TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    value   TEXT,
+    updated REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS kv_updated ON kv (updated);
+"""
+
+_BATCH = 500
+
+
+def backend() -> str:
+    """STATE_BACKEND: "json" (по умолчанию) или "sqlite"."""
+    return (os.getenv("STATE_BACKEND") or "json").strip().lower()
+
+
+class Store:
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    # ---- read ----
+
+    def has(self, ns: str, key: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM kv WHERE ns = ? AND key = ? AND value IS NOT NULL", (ns, key)
+        ).fetchone()
+        return row is not None
+
+    def get(self, ns: str, key: str, default=None):
+        row = self.conn.execute(
+            "SELECT value FROM kv WHERE ns = ? AND key = ? AND value IS NOT NULL", (ns, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_all(self, ns: str) -> Dict[str, Any]:
+        rows = self.conn.execute(
+            "SELECT key, value FROM kv WHERE ns = ? AND value IS NOT NULL", (ns,)
+        )
+        return {k: json.loads(v) for k, v in rows}
+
+    def keys(self, ns: str) -> Set[str]:
+        rows = self.conn.execute("SELECT key FROM kv WHERE ns = ? AND value IS NOT NULL", (ns,))
+        return {k for (k,) in rows}
+
+    def namespaces(self, prefix: str = "") -> List[str]:
+        rows = self.conn.execute(
+            "SELECT DISTINCT ns FROM kv WHERE ns >= ? AND ns < ?", (prefix, prefix + "\uffff")
+        )
+        return [ns for (ns,) in rows]
+
+    def is_empty(self, ns: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM kv WHERE ns = ? LIMIT 1", (ns,)).fetchone() is None
+
+    # ---- write ----
+
+    def _write_rows(self, rows: List[tuple]) -> None:
+        with self.conn:
+            for i in range(0, len(rows), _BATCH):
+                self.conn.executemany(
+                    "INSERT INTO kv (ns, key, value, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                    rows[i:i + _BATCH],
+                )
+
+    def put_many(self, ns: str, items: Dict[str, Any], updated: Optional[float] = None) -> None:
+        ts = time.time() if updated is None else updated
+        rows = [
+            (ns, k, json.dumps(v, ensure_ascii=False, separators=(",", ":")), ts)
+            for k, v in items.items()
+        ]
+        if rows:
+            self._write_rows(rows)
+
+    def delete_many(self, ns: str, keys: Iterable[str]) -> None:
+        ts = time.time()
+        rows = [(ns, k, None, ts) for k in keys]
+        if rows:
+            self._write_rows(rows)
+
+    # ---- shard deltas ----
+
+    def export_delta(self, since: float = 0.0) -> Dict[str, Any]:
+        rows = self.conn.execute(
+            "SELECT ns, key, value, updated FROM kv WHERE updated > ? ORDER BY ns, key", (since,)
+        )
+        return {"version": 1, "rows": [list(r) for r in rows]}
+
+    def merge_delta(self, delta: Dict[str, Any]) -> int:
+        """
+        Вливает дельту другого шарда: по каждому (ns, key) побеждает более поздний updated.
+        Возвращает число применённых строк.
+        """
+        rows = [tuple(r) for r in (delta or {}).get("rows") or [] if isinstance(r, list) and len(r) == 4]
+        if not rows:
+            return 0
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO kv (ns, key, value, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value, updated = excluded.updated "
+                "WHERE excluded.updated > kv.updated",
+                rows,
+            )
+        return self.conn.total_changes - before
+
+
+_STORE: Optional[Store] = None
+
+
+def get_store() -> Store:
+    global _STORE
+    if _STORE is None:
+        _STORE = Store(DB_PATH)
+    return _STORE
+
+
+def main(argv: List[str]) -> int:
+    """
+    python -m utils.store export-delta OUT.json
+    python -m utils.store merge DELTA.json [DELTA.json ...]   (+ экспорт в JSON-файлы data/)
+    python -m utils.store export-json
+    """
+    from utils.state import export_seen_json
+    from utils.state2 import export_state_json
+
+    if not argv:
+        print(main.__doc__)
+        return 2
+
+    # CLI работает только с sqlite-хранилищем
+    os.environ["STATE_BACKEND"] = "sqlite"
+    cmd, args = argv[0], argv[1:]
+    store = get_store()
+
+    if cmd == "export-delta" and args:
+        with open(args[0], "w", encoding="utf-8") as f:
+            json.dump(store.export_delta(), f, ensure_ascii=False)
+        return 0
+
+    if cmd in ("merge", "export-json"):
+        if cmd == "merge":
+            # импорт закоммиченных JSON (updated=0), чтобы экспорт включал старые данные
+            from utils.state import load_seen
+            from utils.state2 import load_state, CCXT_STATE_PATH
+            load_seen()
+            load_state(CCXT_STATE_PATH)
+            for p in args:
+                try:
+                    with open(p, "r", encoding="utf-8") as f:
+                        n = store.merge_delta(json.load(f))
+                    print(f"[store] merged {p}: {n} rows")
+                except Exception as e:
+                    print(f"[store] skip {p}: {e}")
+        export_seen_json(store)
+        export_state_json(store)
+        return 0
+
+    print(main.__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
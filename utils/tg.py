@@ -1,13 +1,27 @@
 import os
+import threading
 import time
-import requests
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
 
-API = "https://api.telegram.org"
+from utils.ratelimit import limiter, TokenBucket
+from utils import httpclient, metrics
 
-# мягкий лимит по сообщениям (чтобы не ловить 429)
-_MIN_INTERVAL_SECONDS = float(os.getenv("TG_MIN_INTERVAL", "0.25"))  # 0.25 сек = 4 msg/sec
-_LAST_SEND_TS = 0.0
+API = os.getenv("TG_API", "https://api.telegram.org").rstrip("/")
+
+# Рассылка по чатам идёт параллельно (пул потоков, общая keep-alive сессия httpclient),
+# лимиты раздельные:
+#   общий на бота  — limiter(API), TG_GLOBAL_RATE msg/sec (см. utils.ratelimit)
+#   на каждый чат  — TG_CHAT_INTERVAL сек между сообщениями в один чат
+# TG_MIN_INTERVAL сохраняет прежний смысл — общий интервал между любыми сообщениями бота.
+# Время рассылки одного алерта почти не зависит от числа чатов.
+
+CHAT_INTERVAL = float(os.getenv("TG_CHAT_INTERVAL", "0.25"))
+WORKERS = int(os.getenv("TG_WORKERS", "8"))
+
+_CHAT_LIMITS: Dict[str, TokenBucket] = {}
+_CHAT_LOCK = threading.Lock()
+_POOL: Optional[ThreadPoolExecutor] = None
 
 
 def _parse_chat_ids() -> List[str]:
@@ -39,87 +53,135 @@ def _parse_chat_ids() -> List[str]:
     return out
 
 
-def _sleep_for_rate_limit():
-    global _LAST_SEND_TS
-    now = time.time()
-    wait = (_LAST_SEND_TS + _MIN_INTERVAL_SECONDS) - now
-    if wait > 0:
-        time.sleep(wait)
-    _LAST_SEND_TS = time.time()
+def _chat_limiter(chat_id: str) -> TokenBucket:
+    with _CHAT_LOCK:
+        b = _CHAT_LIMITS.get(chat_id)
+        if b is None:
+            rate = 1.0 / max(CHAT_INTERVAL, 0.01)
+            b = TokenBucket(f"tg:{chat_id}", rate, 1, rate)
+            _CHAT_LIMITS[chat_id] = b
+        return b
 
 
-def send_telegram_message(
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _CHAT_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=max(1, WORKERS), thread_name_prefix="tg")
+        return _POOL
+
+
+def _sleep_for_rate_limit(chat_id: str):
+    # сначала свой чат, потом общий — чтобы не держать общий токен, пока ждём чат
+    _chat_limiter(chat_id).acquire()
+    limiter(API).acquire()
+
+
+def _send_one(url: str, payload: dict, max_retries: int) -> bool:
+    # tg_send_seconds — вместе с ожиданием лимитов и повторами
+    with metrics.timer("tg_send_seconds"):
+        ok = _send_with_retries(url, payload, max_retries)
+    metrics.inc("tg_messages", status="ok" if ok else "failed")
+    return ok
+
+
+def _send_with_retries(url: str, payload: dict, max_retries: int) -> bool:
+    chat_id = str(payload["chat_id"])
+    attempt = 0
+
+    while True:
+        attempt += 1
+        _sleep_for_rate_limit(chat_id)
+
+        try:
+            r = httpclient.post(url, json=payload, timeout=25)
+        except Exception:
+            if attempt >= max_retries:
+                return False
+            time.sleep(min(2 ** attempt, 20))
+            continue
+
+        # OK
+        if r.status_code == 200:
+            limiter(API).success()
+            _chat_limiter(chat_id).success()
+            return True
+
+        # Telegram rate limit: пауза на чат, общий лимит — вдвое медленнее;
+        # следующий _sleep_for_rate_limit() их выждет
+        if r.status_code == 429:
+            metrics.inc("tg_rate_limited")
+            retry_after = 3
+            try:
+                j = r.json()
+                retry_after = int(j.get("parameters", {}).get("retry_after", retry_after))
+            except Exception:
+                pass
+
+            _chat_limiter(chat_id).throttle(min(retry_after + 1, 60))
+            limiter(API).throttle(0.0)
+            if attempt >= max_retries:
+                return False
+            continue
+
+        # другие ошибки
+        if attempt >= max_retries:
+            return False
+        time.sleep(min(2 ** attempt, 20))
+
+
+def send_to_chats(
     text: str,
     parse_mode: str = "MarkdownV2",
     disable_web_page_preview: bool = True,
     max_retries: int = 6,
-) -> bool:
+    chat_ids: Optional[List[str]] = None,
+) -> Dict[str, bool]:
     """
-    Возвращает:
-      True  — если успешно отправили во ВСЕ чаты
-      False — если хотя бы в один чат не смогли отправить
+    Отправка во все чаты параллельно.
+    Возвращает {chat_id: ok}; пустой dict — нет токена или чатов.
     """
     token = (os.getenv("TG_BOT_TOKEN") or "").strip()
     if not token:
-        return False
+        return {}
 
-    chat_ids = _parse_chat_ids()
+    chat_ids = _parse_chat_ids() if chat_ids is None else chat_ids
     if not chat_ids:
-        return False
+        return {}
 
     url = f"{API}/bot{token}/sendMessage"
 
-    all_ok = True
-
-    for chat_id in chat_ids:
-        payload = {
+    def payload(chat_id: str) -> dict:
+        return {
             "chat_id": chat_id,
             "text": text,
             "parse_mode": parse_mode,
             "disable_web_page_preview": disable_web_page_preview,
         }
 
-        attempt = 0
-        ok_for_this_chat = False
-
-        while True:
-            attempt += 1
-            _sleep_for_rate_limit()
+    if len(chat_ids) == 1:
+        return {chat_ids[0]: _send_one(url, payload(chat_ids[0]), max_retries)}
 
-            try:
-                r = requests.post(url, json=payload, timeout=25)
-            except Exception:
-                if attempt >= max_retries:
-                    break
-                time.sleep(min(2 ** attempt, 20))
-                continue
-
-            # OK
-            if r.status_code == 200:
-                ok_for_this_chat = True
-                break
-
-            # Telegram rate limit
-            if r.status_code == 429:
-                retry_after = 3
-                try:
-                    j = r.json()
-                    retry_after = int(j.get("parameters", {}).get("retry_after", retry_after))
-                except Exception:
-                    pass
-
-                if attempt >= max_retries:
-                    break
-
-                time.sleep(min(retry_after + 1, 60))
-                continue
-
-            # другие ошибки
-            if attempt >= max_retries:
-                break
-            time.sleep(min(2 ** attempt, 20))
+    futures = {c: _pool().submit(_send_one, url, payload(c), max_retries) for c in chat_ids}
+    out = {}
+    for chat_id, fut in futures.items():
+        try:
+            out[chat_id] = bool(fut.result())
+        except Exception:
+            out[chat_id] = False
+    return out
 
-        if not ok_for_this_chat:
-            all_ok = False
 
-    return all_ok
+def send_telegram_message(
+    text: str,
+    parse_mode: str = "MarkdownV2",
+    disable_web_page_preview: bool = True,
+    max_retries: int = 6,
+) -> bool:
+    """
+    Возвращает:
+      True  — если успешно отправили во ВСЕ чаты
+      False — если хотя бы в один чат не смогли отправить
+    """
+    res = send_to_chats(text, parse_mode, disable_web_page_preview, max_retries)
+    return bool(res) and all(res.values())